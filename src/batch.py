@@ -0,0 +1,162 @@
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Plots go to files; no display is needed. Set before matplotlib is first imported.
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import cleaning
+import extraction
+import metrics
+from content_store import ContentStore
+from corpus_index import CorpusIndex
+from db_handler import DatabaseHandler
+from pipeline import TOP_TOPICS, SubjectPipeline
+
+FILE_KEYS = ("cdp", "pyq", "notes")
+# pyplot keeps global state, so only one thread draws at a time.
+PLOT_LOCK = threading.Lock()
+
+
+# ----------------------- Manifest -----------------------
+def load_manifest(path):
+    """Reads subjects from a JSON or CSV manifest.
+
+    JSON is a list (or {"subjects": [...]}) of {"subject", "cdp", "pyq", "notes"};
+    CSV has the same column names. Relative file paths are resolved against the
+    manifest's directory.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            entries = list(csv.DictReader(f))
+        else:
+            data = json.load(f)
+            entries = data["subjects"] if isinstance(data, dict) else data
+    base_dir = os.path.dirname(os.path.abspath(path))
+    subjects, seen = [], set()
+    for i, entry in enumerate(entries, 1):
+        missing = [key for key in ("subject",) + FILE_KEYS if not str(entry.get(key) or "").strip()]
+        if missing:
+            raise ValueError(f"Manifest entry {i} is missing {', '.join(missing)}")
+        name = entry["subject"].strip()
+        if name in seen:
+            raise ValueError(f"Subject '{name}' appears twice in the manifest")
+        seen.add(name)
+        subjects.append({"subject": name, **{key: os.path.join(base_dir, entry[key].strip()) for key in FILE_KEYS}})
+    return subjects
+
+
+# ----------------------- Subject Worker -----------------------
+def process_subject(entry, existing="skip", plots_dir=None, store=None, verdict_cache=None, corpus_index=None,
+                    **options):
+    """Runs one manifest subject through the pipeline; returns a summary dict.
+
+    Subjects already stored with topics are skipped, or with existing="update"
+    run again, where the PDF, verdict and content caches make unchanged inputs cheap.
+    """
+    subject_name = entry["subject"]
+    summary = {"subject": subject_name, "status": "done", "topics": 0, "first_artifact_s": None,
+               "total_s": 0.0, "errors": 0, "message": ""}
+    start = time.perf_counter()
+    try:
+        missing = [entry[key] for key in FILE_KEYS if not os.path.exists(entry[key])]
+        if missing:
+            raise FileNotFoundError(f"Missing file(s): {', '.join(missing)}")
+        with DatabaseHandler() as db:
+            if db.subject_exists(subject_name) and existing == "skip":
+                stored = db.fetch_topics(subject_name)
+                if stored:
+                    summary.update(status="skipped", topics=len(stored), message="already processed")
+                    return summary
+            db.insert_subject(subject_name, entry["cdp"], entry["pyq"], entry["notes"])
+            subject_pipeline = SubjectPipeline(subject_name, db=db, store=store, verdict_cache=verdict_cache,
+                                               corpus_index=corpus_index, **options)
+            artifacts = subject_pipeline.run(entry["cdp"], entry["pyq"], entry["notes"])
+
+        stats = subject_pipeline.stats
+        summary.update(topics=len(artifacts), first_artifact_s=stats.first_artifact_s,
+                       errors=sum(stage.errors for stage in stats.stages.values()))
+        if not artifacts:
+            summary.update(status="failed", message="no topics were stored")
+        elif summary["errors"]:
+            summary.update(status="partial", message=f"{summary['errors']} stage errors")
+
+        if plots_dir and subject_pipeline.topic_graph is not None:
+            os.makedirs(plots_dir, exist_ok=True)
+            prefix = os.path.join(plots_dir, subject_name.replace(os.sep, "_").replace(" ", "_"))
+            with PLOT_LOCK:
+                extraction.visualize_graph(subject_pipeline.topic_graph, f"{prefix}_graph.png")
+                extraction.visualize_topic_importance(subject_pipeline.importance_score, f"{prefix}_importance.png")
+    except Exception as e:
+        summary.update(status="failed", message=str(e))
+    finally:
+        summary["total_s"] = time.perf_counter() - start
+    return summary
+
+
+def run_batch(subjects, workers=2, existing="skip", plots_dir="plots", **options):
+    """Processes manifest subjects across `workers` threads; returns their summaries in manifest order.
+
+    One content store, verdict cache and corpus index are shared, so a topic that
+    several subjects cover is classified and scraped once.
+    """
+    store = options.pop("store", None) or ContentStore()
+    verdict_cache = options.pop("verdict_cache", None) or cleaning.VerdictCache()
+    corpus_index = options.pop("corpus_index", None)
+    corpus_index = corpus_index if corpus_index is not None else CorpusIndex()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(process_subject, entry, existing, plots_dir, store, verdict_cache, corpus_index,
+                                   **options)
+                   for entry in subjects]
+        return [future.result() for future in futures]
+
+
+def format_summary(summaries):
+    lines = [f"{'subject':<30} {'status':<8} {'topics':>6} {'first':>8} {'total':>8}  message"]
+    for row in summaries:
+        first = f"{row['first_artifact_s']:.2f}s" if row["first_artifact_s"] is not None else "-"
+        lines.append(f"{row['subject'][:30]:<30} {row['status']:<8} {row['topics']:>6} {first:>8} "
+                     f"{row['total_s']:>7.2f}s  {row['message']}")
+    counts = {status: sum(row["status"] == status for row in summaries)
+              for status in ("done", "partial", "skipped", "failed")}
+    lines.append(", ".join(f"{status}: {count}" for status, count in counts.items()))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process many subjects without the upload window.")
+    parser.add_argument("manifest", help="JSON or CSV file listing subject, cdp, pyq and notes paths")
+    parser.add_argument("--workers", type=int, default=2, help="subjects processed at the same time")
+    parser.add_argument("--existing", choices=("skip", "update"), default="skip",
+                        help="what to do with subjects that already have stored topics")
+    parser.add_argument("--plots-dir", default="plots", help="directory for graph and importance plots")
+    parser.add_argument("--no-plots", action="store_true", help="do not draw plots")
+    parser.add_argument("--top", type=int, default=TOP_TOPICS, help="topics scraped and stored per subject")
+    parser.add_argument("--report", help="also write the per-subject summary to this JSON file")
+    parser.add_argument("--metrics-dir", default=metrics.METRICS_DIR,
+                        help="directory for per-subject metrics JSON and the Prometheus text file")
+    parser.add_argument("--profile", action="append", default=[], metavar="SPAN",
+                        help="capture a cProfile dump of a span such as stage_rank or llm_batch (repeatable)")
+    args = parser.parse_args(argv)
+
+    for name in args.profile:
+        print(f"Profiling {name} into {metrics.profile(name)}")
+    subjects = load_manifest(args.manifest)
+    start = time.perf_counter()
+    summaries = run_batch(subjects, workers=args.workers, existing=args.existing,
+                          plots_dir=None if args.no_plots else args.plots_dir, limit=args.top,
+                          metrics_dir=args.metrics_dir)
+    print(f"\n*Batch Summary* ({len(subjects)} subjects in {time.perf_counter() - start:.2f}s)")
+    print(format_summary(summaries))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=4)
+    return 1 if any(row["status"] == "failed" for row in summaries) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,310 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from benchmark import WORDS, synthetic_topics
+from local_services import FakeOllama, FakeWikipedia, FakeYouTube, canned_article
+
+SUITE_VERSION = 1
+# Helvetica 9pt on an A4 page: about 100 characters a line and 68 lines a page.
+LINE_CHARS = 90
+LINES_PER_PAGE = 66
+CDP_NOISE = ["course development plan: 23cse000", "course objectives:", "faculty: dr", "unit {n}",
+             "as examples", "with analysis and", "syllabus"]
+
+
+# ----------------------- Synthetic Course -----------------------
+def pack_lines(parts, width=LINE_CHARS):
+    """Joins parts into lines of at most `width` characters without splitting a part."""
+    lines, line = [], ""
+    for part in parts:
+        if line and len(line) + 1 + len(part) > width:
+            lines.append(line)
+            line = part
+        else:
+            line = f"{line} {part}" if line else part
+    return lines + ([line] if line else [])
+
+
+def write_pdf(path, lines, pages=None):
+    """Writes `lines` to a PDF, LINES_PER_PAGE a page, padding to at least `pages` pages."""
+    import fitz
+
+    pages = max(pages or 1, -(-len(lines) // LINES_PER_PAGE))
+    per_page = -(-len(lines) // pages) if lines else 0
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        text = "\n".join(lines[i * per_page:(i + 1) * per_page])
+        if text:
+            page.insert_text((40, 40), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def synthetic_course(directory, topics=60, cdp_pages=2, pyq_pages=2, notes_pages=40, notes_chars=150_000,
+                     pyq_share=0.3, seed=0):
+    """Writes a CDP, PYQ and notes PDF for one made-up subject; returns their paths and the true topics.
+
+    The CDP lists every topic between course-plan noise the pre-filter and the
+    LLM should drop, the PYQ asks about `pyq_share` of them, and the notes mention
+    them among filler words. The same seed always gives the same files.
+    """
+    if notes_chars > notes_pages * LINES_PER_PAGE * LINE_CHARS:
+        raise ValueError(f"{notes_chars} characters of notes do not fit on {notes_pages} pages")
+    rng = random.Random(seed)
+    names = synthetic_topics(topics, rng)
+    os.makedirs(directory, exist_ok=True)
+
+    cdp_parts = []
+    for i, topic in enumerate(names):
+        if i % 8 == 0:
+            cdp_parts.append(rng.choice(CDP_NOISE).format(n=i // 8 + 1) + ",")
+        cdp_parts.append(f"{topic},")
+    cdp = write_pdf(os.path.join(directory, "cdp.pdf"), pack_lines(cdp_parts), cdp_pages)
+
+    asked = rng.sample(names, max(1, int(len(names) * pyq_share)))
+    pyq_lines = [f"{i}. {topic} ({rng.choice((2, 5, 10))} marks)" for i, topic in enumerate(asked, 1)]
+    pyq = write_pdf(os.path.join(directory, "pyq.pdf"), pyq_lines, pyq_pages)
+
+    parts, length = [], 0
+    while length < notes_chars:
+        part = rng.choice(names) if rng.random() < 0.1 else rng.choice(WORDS)
+        parts.append(part)
+        length += len(part) + 1
+    notes = write_pdf(os.path.join(directory, "notes.pdf"), pack_lines(parts), notes_pages)
+    return {"cdp": cdp, "pyq": pyq, "notes": notes, "topics": names}
+
+
+def page_count(path):
+    import fitz
+
+    with fitz.open(path) as doc:
+        return len(doc)
+
+
+# ----------------------- Measurement -----------------------
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, -(-len(sorted_values) * q // 100) - 1))]
+
+
+def measure_stage(prepare, repeats=5, warmup=1):
+    """Times a stage. `prepare()` resets its state and returns [(items, call)] for one pass.
+
+    Every call is timed on its own over `warmup` untimed and `repeats` timed
+    passes; one more pass runs under tracemalloc for the peak Python heap, which
+    leaves out native (PyMuPDF) and worker-process memory.
+    """
+    for _ in range(warmup):
+        for _, call in prepare():
+            call()
+    latencies, items = [], 0
+    for _ in range(repeats):
+        for count, call in prepare():
+            start = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - start)
+            items += count
+
+    calls = prepare()
+    tracemalloc.start()
+    try:
+        for _, call in calls:
+            call()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    total = sum(latencies)
+    return {"items": items // max(1, repeats), "calls": len(latencies) // max(1, repeats), "repeats": repeats,
+            "total_s": total, "throughput_per_s": items / total if total else 0.0,
+            "latency_ms": {"mean": 1000 * total / len(latencies) if latencies else 0.0,
+                           **{f"p{q}": 1000 * percentile(latencies, q) for q in (50, 90, 99)},
+                           "max": 1000 * latencies[-1] if latencies else 0.0},
+            "peak_memory_kb": peak / 1024}
+
+
+# ----------------------- Stage Suite -----------------------
+def run_suite(topics=60, cdp_pages=2, pyq_pages=2, notes_pages=40, notes_chars=150_000, limit=10, articles=10,
+              article_paragraphs=80, latency=0.02, repeats=5, seed=0, stages=None):
+    """Runs every stage against a synthetic course and local stand-ins for Ollama, Wikipedia, YouTube and the
+    database (SQLite); returns the report as a dict.
+
+    Runs inside a temporary working directory, so the PDF, verdict and content
+    caches start empty and nothing outside it is touched.
+    """
+    import cleaning
+    import extraction
+    import scraping
+    from db_handler import DatabaseHandler, SQLiteBackend
+    from video_lookup import VideoLookup
+
+    config = {"topics": topics, "cdp_pages": cdp_pages, "pyq_pages": pyq_pages, "notes_pages": notes_pages,
+              "notes_chars": notes_chars, "limit": limit, "articles": articles,
+              "article_paragraphs": article_paragraphs, "latency": latency, "repeats": repeats, "seed": seed}
+    report = {"suite_version": SUITE_VERSION, **environment(), "config": config, "stages": {}}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, FakeOllama(latency=latency) as ollama, \
+            FakeWikipedia(latency=latency) as wiki, FakeYouTube(latency=latency) as youtube:
+        os.chdir(tmp)
+        try:
+            course = synthetic_course(os.path.join(tmp, "course"), topics, cdp_pages, pyq_pages, notes_pages,
+                                      notes_chars, seed=seed)
+            notes_text = extraction.extract_text_from_pdf(course["notes"])
+            cdp_topics = extraction.extract_topics_from_pdf(course["cdp"])
+            pyq_topics = extraction.extract_topics_from_pdf(course["pyq"])
+            adjacency_list, importance = extraction.create_adjacency_list(cdp_topics, notes_text, pyq_topics)
+            ranked = [topic for topic, _ in extraction.rank_topics_with_pagerank(adjacency_list)]
+            kept = cleaning.clean_list(ranked, base_url=ollama.url, cache=cleaning.VerdictCache(None))[:limit]
+            texts = [" ".join(canned_article(topic, article_paragraphs)) for topic in (kept * articles)[:articles]]
+            pages = page_count(course["notes"])
+
+            def cold(call):
+                # The page cache would turn every pass after the first into a JSON read.
+                def run():
+                    shutil.rmtree(os.path.join(tmp, "pdf_cache"), ignore_errors=True)
+                    call()
+                return run
+
+            db_passes, open_dbs = itertools.count(), []
+
+            def db_calls():
+                while open_dbs:
+                    open_dbs.pop().close()
+                # A new file per pass; pooled SQLite connections outlive a deleted one.
+                db = DatabaseHandler(SQLiteBackend(os.path.join(tmp, f"bench_{next(db_passes)}.db")))
+                open_dbs.append(db)
+                calls = [(1, lambda: db.insert_subject("bench", course["cdp"], course["pyq"], course["notes"]))]
+                calls += [(1, lambda rank=rank, topic=topic: db.insert_scraped_topics(
+                    "bench", [(topic, f"records/{topic}.pdf", rank, importance.get(topic))]))
+                          for rank, topic in enumerate(ranked, 1)]
+                return calls
+
+            def video_calls():
+                lookup = VideoLookup(api_key="bench", base_url=youtube.url, cache_path=None, rate=0)
+                return [(1, lambda topic=topic: scraping.fetch_top_youtube_videos(topic, lookup)) for topic in kept]
+
+            def pdf_calls():
+                records_dir = os.path.join(tmp, "records")
+                shutil.rmtree(records_dir, ignore_errors=True)
+                videos = [(f"{topic} explained", f"https://www.youtube.com/watch?v={i}") for i, topic in enumerate(kept)]
+                return [(1, lambda topic=topic, text=text: scraping.save_to_pdf(topic, text, videos[:5], records_dir))
+                        for topic, text in zip(kept, texts)]
+
+            suite = {
+                "extract_text_from_pdf": ("pages", lambda: [
+                    (pages, cold(lambda: extraction.extract_text_from_pdf(course["notes"])))]),
+                "extract_topics_from_pdf": ("pdfs", lambda: [
+                    (1, cold(lambda path=course[key]: extraction.extract_topics_from_pdf(path))) for key in ("cdp", "pyq")]),
+                "create_adjacency_list": ("topics", lambda: [
+                    (len(cdp_topics), lambda: extraction.create_adjacency_list(cdp_topics, notes_text, pyq_topics))]),
+                "rank_topics_with_pagerank": ("topics", lambda: [
+                    (len(ranked), lambda: extraction.rank_topics_with_pagerank(adjacency_list))]),
+                "clean_list": ("topics", lambda: [
+                    (len(ranked), lambda: cleaning.clean_list(ranked, base_url=ollama.url,
+                                                              cache=cleaning.VerdictCache(None)))]),
+                "scrape_data": ("topics", lambda: [
+                    (len(kept), lambda: scraping.scrape_data(kept, base_url=wiki.url, rate=0))]),
+                "summarize_text": ("articles", lambda: [
+                    (1, lambda text=text: scraping.summarize_text(text)) for text in texts]),
+                "fetch_top_youtube_videos": ("topics", video_calls),
+                "save_to_pdf": ("pdfs", pdf_calls),
+                "db_inserts": ("rows", db_calls),
+            }
+            for name, (unit, prepare) in suite.items():
+                if stages and name not in stages:
+                    continue
+                row = report["stages"][name] = {"unit": unit, **measure_stage(prepare, repeats)}
+                print(f"{name:>26} | {row['throughput_per_s']:10.1f} {unit}/s | p50 {row['latency_ms']['p50']:9.2f} ms | "
+                      f"p99 {row['latency_ms']['p99']:9.2f} ms | peak {row['peak_memory_kb']:9.0f} KiB")
+            for db in open_dbs:
+                db.close()
+        finally:
+            os.chdir(cwd)
+    return report
+
+
+def environment():
+    """Commit, interpreter and machine the numbers were taken on."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {"commit": commit, "dirty": dirty, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+
+def compare(baseline, current, tolerance=0.2):
+    """Prints each stage's throughput and p50 change against a baseline report; returns the regressed stages.
+
+    A stage regresses when its throughput drops by more than `tolerance` (a fraction).
+    """
+    if baseline.get("config") != current.get("config"):
+        print("Warning: the reports were taken with different configurations.")
+    regressed = []
+    print(f"Against {(baseline.get('commit') or 'unknown')[:10]}:")
+    for name, row in current["stages"].items():
+        old = baseline["stages"].get(name)
+        if not old:
+            print(f"{name:>26} | new stage")
+            continue
+        ratio = row["throughput_per_s"] / old["throughput_per_s"] if old["throughput_per_s"] else float("inf")
+        p50_ratio = row["latency_ms"]["p50"] / old["latency_ms"]["p50"] if old["latency_ms"]["p50"] else float("inf")
+        flag = ""
+        if ratio < 1 - tolerance:
+            regressed.append(name)
+            flag = "  REGRESSED"
+        print(f"{name:>26} | throughput x{ratio:5.2f} | p50 x{p50_ratio:5.2f}{flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every EduMate stage on a synthetic course.")
+    parser.add_argument("--topics", type=int, default=60, help="topics listed in the synthetic CDP")
+    parser.add_argument("--cdp-pages", type=int, default=2)
+    parser.add_argument("--pyq-pages", type=int, default=2)
+    parser.add_argument("--notes-pages", type=int, default=40)
+    parser.add_argument("--notes-chars", type=int, default=150_000, help="length of the notes text")
+    parser.add_argument("--limit", type=int, default=10, help="topics scraped, summarized and rendered")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds each stand-in service waits per request")
+    parser.add_argument("--repeats", type=int, default=5, help="timed passes per stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stage", action="append", help="only run this stage (repeatable)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON report of an earlier commit to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="throughput drop (fraction) that counts as a regression with --compare")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.topics, args.cdp_pages, args.pyq_pages, args.notes_pages, args.notes_chars, args.limit,
+                       latency=args.latency, repeats=args.repeats, seed=args.seed, stages=args.stage)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"Report: {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            if compare(json.load(f), report, args.tolerance):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,875 @@
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from local_services import FakeOllama, FakeWikipedia
+from matcher import TopicMatcher
+from topic_graph import TopicGraph
+
+WORDS = ["graph", "sort", "merge", "heap", "tree", "search", "flow", "matching", "dynamic", "programming",
+         "greedy", "knapsack", "string", "path", "shortest", "spanning", "binary", "hash", "queue", "stack"]
+
+
+def synthetic_topics(count, rng):
+    """Builds `count` distinct lowercase topics of one to three words."""
+    topics = set()
+    while len(topics) < count:
+        topics.add(" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) + f" {len(topics)}")
+    return sorted(topics)
+
+
+def synthetic_notes(topics, size, rng):
+    """Builds roughly `size` characters of notes with topics sprinkled through filler words."""
+    parts, length = [], 0
+    while length < size:
+        part = rng.choice(topics) if rng.random() < 0.1 else rng.choice(WORDS)
+        parts.append(part)
+        length += len(part) + 1
+    return " ".join(parts)
+
+
+# ----------------------- Topic Matching -----------------------
+def _regex_adjacency_list(cdp_topics, notes_text, pyq_topics):
+    # create_adjacency_list as it was before TopicMatcher: one regex scan per topic and per topic pair,
+    # scored with a TfidfVectorizer fit on the notes. Also returns the counts and tf-idf scores it used.
+    import extraction
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    adjacency_list, topic_mention_count = {}, {}
+    pyq_weights = extraction.match_topics(cdp_topics, pyq_topics)
+    vectorizer = TfidfVectorizer(vocabulary=cdp_topics)
+    tfidf_scores = dict(zip(vectorizer.get_feature_names_out(), vectorizer.fit_transform([notes_text]).toarray()[0]))
+    counts = {}
+    for topic in cdp_topics:
+        counts[topic] = len(re.findall(r"\b" + re.escape(topic) + r"\b", notes_text))
+        topic_mention_count[topic] = counts[topic] * 1.5 + pyq_weights.get(topic, 0) + tfidf_scores.get(topic, 0) * 5
+        related = [other for other in cdp_topics
+                   if topic != other and re.search(r"\b" + re.escape(other) + r"\b", notes_text)]
+        if related:
+            adjacency_list[topic] = related
+    return adjacency_list, topic_mention_count, counts, tfidf_scores
+
+
+def bench_topic_matching(topic_counts=(25, 50, 100, 200), note_sizes=(20_000, 100_000), seed=0):
+    """Times the original regex-scan create_adjacency_list against the current single-pass one.
+
+    The tf-idf term changed too (phrase counts instead of a TfidfVectorizer over single
+    words), so importance is checked with each side's own tf-idf term taken out.
+    """
+    import extraction
+
+    rng = random.Random(seed)
+    rows = []
+    for size in note_sizes:
+        for count in topic_counts:
+            topics = synthetic_topics(count, rng)
+            notes_text = synthetic_notes(topics, size, rng)
+            pyq_topics = rng.sample(topics, count // 5)
+
+            start = time.perf_counter()
+            expected_adjacency, expected_importance, counts, old_tfidf = _regex_adjacency_list(
+                topics, notes_text, pyq_topics)
+            regex_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            adjacency, importance = extraction.create_adjacency_list(topics, notes_text, pyq_topics)
+            matcher_time = time.perf_counter() - start
+
+            new_tfidf = extraction.tfidf_scores(counts)
+            if adjacency != expected_adjacency or set(importance) != set(expected_importance) or any(
+                    abs((importance[topic] - new_tfidf.get(topic, 0) * 5)
+                        - (expected_importance[topic] - old_tfidf.get(topic, 0) * 5)) > 1e-9 for topic in topics):
+                raise AssertionError(f"create_adjacency_list differs from the regex scan ({count} topics, {size} chars)")
+            rows.append({"topics": count, "notes_chars": size,
+                         "regex_s": regex_time, "matcher_s": matcher_time,
+                         "speedup": regex_time / matcher_time if matcher_time else float("inf")})
+            print(f"{count:>5} topics {size:>8} chars | regex {regex_time:8.3f}s | "
+                  f"matcher {matcher_time:8.3f}s | x{rows[-1]['speedup']:.1f}")
+    return rows
+
+
+# ----------------------- PageRank -----------------------
+def synthetic_adjacency(count, density, rng):
+    """Builds a random adjacency dict over `count` topics with the given edge density."""
+    topics = [f"topic {i}" for i in range(count)]
+    return {topic: [other for other in topics if other != topic and rng.random() < density] for topic in topics}
+
+
+def bench_pagerank(topic_counts=(100, 300, 1000), density=0.5, seed=0):
+    """Times networkx PageRank against the CSR power iteration, cold and warm-started."""
+    import networkx as nx
+
+    rng = random.Random(seed)
+    rows = []
+    for count in topic_counts:
+        adjacency_list = synthetic_adjacency(count, density, rng)
+
+        start = time.perf_counter()
+        G = nx.DiGraph()
+        for topic, related_topics in adjacency_list.items():
+            for related_topic in related_topics:
+                G.add_edge(topic, related_topic)
+        expected = nx.pagerank(G, alpha=0.85)
+        nx_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        graph = TopicGraph.from_adjacency_list(adjacency_list)
+        scores = graph.pagerank(alpha=0.85)
+        cold_time, cold_iterations = time.perf_counter() - start, graph.iterations
+
+        if max(abs(scores[topic] - expected[topic]) for topic in expected) > 1e-6:
+            raise AssertionError(f"PageRank scores differ from networkx ({count} topics)")
+
+        # Simulate a notes update: drop a few edges and re-rank from the old scores.
+        for related_topics in list(adjacency_list.values())[:max(1, count // 50)]:
+            if related_topics:
+                related_topics.pop()
+        updated = TopicGraph.from_adjacency_list(adjacency_list)
+        start = time.perf_counter()
+        updated.pagerank(alpha=0.85, start=scores)
+        warm_time, warm_iterations = time.perf_counter() - start, updated.iterations
+
+        rows.append({"topics": count, "networkx_s": nx_time, "csr_s": cold_time, "csr_iterations": cold_iterations,
+                     "warm_s": warm_time, "warm_iterations": warm_iterations})
+        print(f"{count:>5} topics | networkx {nx_time:8.3f}s | csr {cold_time:8.3f}s ({cold_iterations} it) | "
+              f"warm {warm_time:8.3f}s ({warm_iterations} it)")
+    return rows
+
+
+# ----------------------- LLM Cleaning -----------------------
+SAMPLE_TITLES = ["merge sort", "unit 2", "dynamic programming", "faculty: dr", "graph traversal", "as examples",
+                 "quick sort", "r", "topological sort", "course overview:", "bellman ford", "string matching"]
+
+
+def bench_clean_list(topic_count=200, latency=0.05, batch_size=20, max_workers=4):
+    """Runs clean_list against a fake Ollama: one title per call, batched, then a cached rerun."""
+    import cleaning
+
+    topics = [f"{title} {i}" for i, title in enumerate(SAMPLE_TITLES * (topic_count // len(SAMPLE_TITLES) + 1))]
+    topics = topics[:topic_count]
+    rows = []
+    with FakeOllama(latency=latency) as ollama, tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "verdicts.json")
+        runs = [("sequential", 1, 1, None), ("batched", batch_size, max_workers, cache_path),
+                ("cached rerun", batch_size, max_workers, cache_path)]
+        for label, size, workers, path in runs:
+            stats = cleaning.CleanStats()
+            start = time.perf_counter()
+            cleaning.clean_list(topics, batch_size=size, max_workers=workers, base_url=ollama.url,
+                                cache=cleaning.VerdictCache(path), stats=stats)
+            elapsed = time.perf_counter() - start
+            rows.append({"run": label, "seconds": elapsed, "hits": stats.hits, "misses": stats.misses,
+                         "llm_calls": stats.llm_calls, "batches": len(stats.batch_latencies)})
+            print(f"{label:>12} | {elapsed:8.3f}s | {stats.summary()}")
+    return rows
+
+
+# ----------------------- Wikipedia Scraping -----------------------
+def bench_scrape_data(topic_count=30, latency=0.2, max_workers=8, rate=20.0, flaky_every=7):
+    """Compares sequential bare requests.get calls with the pooled concurrent scraper."""
+    import requests
+    import scraping
+
+    topics = [f"{title} {i}" for i, title in enumerate(SAMPLE_TITLES * (topic_count // len(SAMPLE_TITLES) + 1))]
+    topics = topics[:topic_count]
+    with FakeWikipedia(latency=latency, flaky_every=flaky_every) as wiki:
+        start = time.perf_counter()
+        sequential = []
+        for topic in topics:
+            response = requests.get(f"{wiki.url}/wiki/{topic.replace(' ', '_')}")
+            if response.status_code == 200:
+                sequential.append(scraping.summarize_text(scraping.parse_wikipedia_html(response.text)))
+        sequential_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = scraping.scrape_data(topics, base_url=wiki.url, max_workers=max_workers, rate=rate)
+        concurrent_time = time.perf_counter() - start
+
+    failed = [result['topic'] for result in results if result['content'].startswith(("Failed", "Error"))]
+    # The old loop also slept random.uniform(1, 3) seconds per topic, about 2s each on average.
+    print(f"{topic_count} topics | sequential {sequential_time:8.3f}s (+~{2 * topic_count}s of sleeps) | "
+          f"concurrent {concurrent_time:8.3f}s | failed after retries: {len(failed)}")
+    return {"topics": topic_count, "sequential_s": sequential_time, "sequential_sleep_s": 2.0 * topic_count,
+            "concurrent_s": concurrent_time, "failed": len(failed)}
+
+
+def bench_wikipedia_backends(topic_count=40, paragraphs=40, latency=0.02, max_workers=8):
+    """Bytes, requests, fetch time and parse time per topic for HTML pages versus MediaWiki API extracts.
+
+    Both backends fetch concurrently on `max_workers` threads as scrape_data does, against a
+    stand-in that returns one whole-article extract per API response like TextExtracts.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    import scraping
+    from http_pool import PooledFetcher
+
+    topics = [f"{title} {i}" for i, title in enumerate(SAMPLE_TITLES * (topic_count // len(SAMPLE_TITLES) + 1))]
+    topics = [topic.replace(' ', '_') for topic in topics[:topic_count]]
+    rows = {}
+    with FakeWikipedia(latency=latency, paragraphs=paragraphs) as wiki, \
+            PooledFetcher(rate=0, pool_size=max_workers) as fetcher, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        start = time.perf_counter()
+        responses = list(executor.map(lambda topic: fetcher.get(f"{wiki.url}/wiki/{topic}"), topics))
+        fetch_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for response in responses:
+            scraping.parse_wikipedia_html(response.text)
+        parse_time = time.perf_counter() - start
+        rows["html"] = {"bytes_per_topic": wiki.bytes_sent / topic_count, "parse_ms_per_topic": 1000 * parse_time / topic_count,
+                        "requests": wiki.requests, "fetch_s": fetch_time}
+
+        sent, requests_before = wiki.bytes_sent, wiki.requests
+        batches = [topics[i:i + scraping.MEDIAWIKI_BATCH_LIMIT] for i in range(0, topic_count, scraping.MEDIAWIKI_BATCH_LIMIT)]
+        start = time.perf_counter()
+        results = list(executor.map(lambda batch: scraping.fetch_extracts(fetcher, batch, wiki.url), batches))
+        fetch_time = time.perf_counter() - start
+        extracts = [extract for found, _ in results for _, extract in found.values()]
+        if len(extracts) != topic_count or not all(extracts):
+            raise AssertionError(f"fetch_extracts returned {sum(map(bool, extracts))} of {topic_count} extracts")
+        start = time.perf_counter()
+        for extract in extracts:
+            scraping.extract_to_text(extract)
+        parse_time = time.perf_counter() - start
+        rows["api"] = {"bytes_per_topic": (wiki.bytes_sent - sent) / topic_count,
+                       "parse_ms_per_topic": 1000 * parse_time / topic_count,
+                       "requests": wiki.requests - requests_before, "fetch_s": fetch_time}
+
+    for backend, row in rows.items():
+        print(f"{backend:>4} | {row['bytes_per_topic']:10.0f} bytes/topic | {row['parse_ms_per_topic']:8.3f} ms parse/topic | "
+              f"{row['requests']} requests | fetched in {row['fetch_s']:.3f}s")
+    return rows
+
+
+# ----------------------- Summarization -----------------------
+def _legacy_summarize(text, num_sentences=5):
+    # summarize_text as it was: re-tokenizes every sentence and keys scores by sentence text.
+    from collections import Counter
+    from nltk.tokenize import sent_tokenize, word_tokenize
+
+    sentences = sent_tokenize(text)
+    if len(sentences) <= num_sentences:
+        return text
+    word_frequencies = Counter(word_tokenize(text.lower()))
+    sentence_scores = {
+        sentence: sum(word_frequencies[word] for word in word_tokenize(sentence.lower()) if word in word_frequencies)
+        for sentence in sentences}
+    return " ".join(sorted(sentence_scores, key=sentence_scores.get, reverse=True)[:num_sentences])
+
+
+def bench_summarizer(article_count=16, paragraphs=(50, 200, 800)):
+    """Times the old summarizer against the vectorized one, per article and as a process-pool batch."""
+    import summarizer
+    from local_services import canned_article
+
+    rows = []
+    for size in paragraphs:
+        texts = [" ".join(canned_article(f"{title} {i}", size))
+                 for i, title in enumerate(SAMPLE_TITLES * (article_count // len(SAMPLE_TITLES) + 1))][:article_count]
+
+        start = time.perf_counter()
+        for text in texts:
+            _legacy_summarize(text)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for text in texts:
+            summarizer.summarize(text)
+        vectorized_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summarizer.summarize_many(texts)
+        batch_time = time.perf_counter() - start
+
+        chars = sum(map(len, texts)) // len(texts)
+        rows.append({"articles": article_count, "chars_per_article": chars, "legacy_s": legacy_time,
+                     "vectorized_s": vectorized_time, "batch_s": batch_time})
+        print(f"{article_count} articles x {chars:>8} chars | legacy {legacy_time:8.3f}s | "
+              f"vectorized {vectorized_time:8.3f}s | process pool {batch_time:8.3f}s")
+    return rows
+
+
+# ----------------------- PDF Extraction -----------------------
+def synthetic_pdf(path, pages, lines_per_page=40, seed=0):
+    """Writes a PDF of `pages` pages of topic-heavy filler text."""
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        text = "\n".join(" ".join(rng.choice(WORDS) for _ in range(10)) for _ in range(lines_per_page))
+        page.insert_text((40, 40), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def bench_pdf_extraction(page_counts=(50, 400), max_workers=None):
+    """Times the old single-process join against pooled decoding and the content-hash cache."""
+    import fitz
+    import pdf_text
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in page_counts:
+            path = synthetic_pdf(os.path.join(tmp, f"notes_{pages}.pdf"), pages)
+            cache_dir = os.path.join(tmp, "cache")
+
+            start = time.perf_counter()
+            with fitz.open(path) as doc:
+                expected = " ".join(page.get_text("text") for page in doc).lower()
+            legacy_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            first_page = None
+            pages_text = []
+            for text in pdf_text.iter_pages(path, max_workers=max_workers, cache_dir=cache_dir):
+                if first_page is None:
+                    first_page = time.perf_counter() - start
+                pages_text.append(text)
+            pooled_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            cached = " ".join(pdf_text.iter_pages(path, cache_dir=cache_dir)).lower()
+            cached_time = time.perf_counter() - start
+
+            if " ".join(pages_text).lower() != expected or cached != expected:
+                raise AssertionError(f"Extracted text differs from PyMuPDF join ({pages} pages)")
+            rows.append({"pages": pages, "legacy_s": legacy_time, "pooled_s": pooled_time,
+                         "first_page_s": first_page, "cached_s": cached_time})
+            print(f"{pages:>5} pages | legacy {legacy_time:8.3f}s | pooled {pooled_time:8.3f}s "
+                  f"(first page after {first_page:.3f}s) | cached {cached_time:8.3f}s")
+    return rows
+
+
+# ----------------------- Candidate Pre-filter -----------------------
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def bench_prefilter(notes_chars=200_000, latency=0.02):
+    """Checks the pre-filter against the labelled CDP fixture and times ranking and cleaning with and without it."""
+    import cleaning
+    import extraction
+    from prefilter import normalize_candidate, prefilter_topics
+
+    with open(os.path.join(FIXTURES_DIR, "labelled_cdp_topics.json"), "r", encoding="utf-8") as f:
+        labelled = json.load(f)["topics"]
+    candidates = [entry["candidate"] for entry in labelled]
+    kept, report = prefilter_topics(candidates)
+    lost = [entry["candidate"] for entry in labelled
+            if entry["topic"] and normalize_candidate(entry["candidate"]) not in kept]
+    noise = [entry for entry in labelled if not entry["topic"]]
+    noise_removed = sum(normalize_candidate(entry["candidate"]) not in kept for entry in noise)
+    print(report)
+    print(f"real topics lost: {len(lost)} | noise removed: {noise_removed}/{len(noise)}")
+    if lost:
+        raise AssertionError(f"Pre-filter dropped labelled topics: {lost}")
+
+    notes_text = synthetic_notes(candidates, notes_chars, random.Random(0))
+    timings = {}
+    with FakeOllama(latency=latency) as ollama:
+        for label, topics in (("unfiltered", candidates), ("prefiltered", kept)):
+            start = time.perf_counter()
+            adjacency_list, _ = extraction.create_adjacency_list(topics, notes_text, [])
+            extraction.rank_topics_with_pagerank(adjacency_list)
+            cleaning.clean_list(topics, base_url=ollama.url, cache=cleaning.VerdictCache(None))
+            timings[label] = time.perf_counter() - start
+    print(f"downstream | unfiltered {timings['unfiltered']:8.3f}s | prefiltered {timings['prefiltered']:8.3f}s | "
+          f"saved {timings['unfiltered'] - timings['prefiltered']:8.3f}s")
+    return {"candidates": len(candidates), "kept": len(kept), "lost": len(lost), "noise_removed": noise_removed,
+            **{f"{label}_s": seconds for label, seconds in timings.items()}}
+
+
+# ----------------------- Database Writes -----------------------
+def bench_db_inserts(row_count=2000, subjects=5):
+    """Inserts per second on SQLite: one insert and commit per topic versus one batch per subject."""
+    from db_handler import DatabaseHandler, SQLiteBackend
+
+    rows = [(f"topic {i}", f"records/topic_{i}.pdf") for i in range(row_count)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SQLiteBackend(os.path.join(tmp, "edumate.db"))
+        with DatabaseHandler(backend) as db:
+            start = time.perf_counter()
+            for s in range(subjects):
+                for topic, pdf_path in rows[:row_count // subjects]:
+                    db.insert_scraped_topic(f"per_row_{s}", topic, pdf_path)
+            results["per_row"] = row_count / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for s in range(subjects):
+                db.insert_scraped_topics(f"batched_{s}", rows[:row_count // subjects])
+            results["batched"] = row_count / (time.perf_counter() - start)
+
+            if len(db.fetch_topics("batched_0")) != row_count // subjects:
+                raise AssertionError("Batched insert lost rows")
+    print(f"{row_count} rows | per-row commits {results['per_row']:10.0f} rows/s | "
+          f"batched {results['batched']:10.0f} rows/s")
+    return results
+
+
+def bench_topic_queries(subjects=200, topics_per_subject=30, lookups=200):
+    """'Which subjects cover topic X': scanning one legacy table per subject versus one indexed join."""
+    from db_handler import DatabaseHandler, SQLiteBackend
+
+    vocabulary = [f"topic {i}" for i in range(subjects * topics_per_subject // 4)]
+    rng = random.Random(11)
+    catalog = {f"subject_{s}": rng.sample(vocabulary, topics_per_subject) for s in range(subjects)}
+    probes = rng.sample(vocabulary, min(lookups, len(vocabulary)))
+    with tempfile.TemporaryDirectory() as tmp:
+        with DatabaseHandler(SQLiteBackend(os.path.join(tmp, "edumate.db"))) as db:
+            with db.transaction() as cursor:
+                for subject, topics in catalog.items():
+                    cursor.execute(f"CREATE TABLE `legacy_{subject}` (id INTEGER PRIMARY KEY, topic_name TEXT, file_name TEXT)")
+                    cursor.executemany(f"INSERT INTO `legacy_{subject}` (topic_name, file_name) VALUES (?, ?)",
+                                       [(topic, f"{topic}.pdf") for topic in topics])
+            for subject, topics in catalog.items():
+                db.insert_scraped_topics(subject, [(topic, f"{topic}.pdf", rank) for rank, topic in enumerate(topics, 1)])
+
+            start = time.perf_counter()
+            legacy = []
+            with db.transaction() as cursor:
+                for topic in probes:
+                    found = []
+                    for subject in catalog:
+                        cursor.execute(f"SELECT 1 FROM `legacy_{subject}` WHERE topic_name = ? LIMIT 1", (topic,))
+                        if cursor.fetchone():
+                            found.append(subject)
+                    legacy.append(sorted(found))
+            per_table = time.perf_counter() - start
+
+            start = time.perf_counter()
+            unified = [sorted(row[0] for row in db.subjects_with_topic(topic)) for topic in probes]
+            indexed = time.perf_counter() - start
+
+            # Legacy tables hold sorted(topics[:10]), not a ranking; migrated topics must stay unranked.
+            legacy_topics = sorted(catalog["subject_0"][:10])
+            with db.transaction() as cursor:
+                cursor.execute("CREATE TABLE `Legacy Subject` (id INTEGER PRIMARY KEY, topic_name TEXT, file_name TEXT)")
+                cursor.executemany("INSERT INTO `Legacy Subject` (topic_name, file_name) VALUES (?, ?)",
+                                   [(topic, f"{topic}.pdf") for topic in legacy_topics])
+            db.insert_subject("Legacy Subject", "cdp.pdf", "pyq.pdf", "notes.pdf")
+            moved = db.migrate_subject_tables(drop=True)
+            migrated = db.top_topics("Legacy Subject")
+            if moved != {**{subject: 0 for subject in catalog}, "Legacy Subject": len(legacy_topics)} \
+                    or migrated != [(topic, f"{topic}.pdf", None, None) for topic in legacy_topics] \
+                    or db.legacy_table_exists("Legacy Subject"):
+                raise AssertionError("Migrating a legacy subject table changed its topics or invented ranks")
+    if legacy != unified:
+        raise AssertionError("Unified schema disagrees with the per-subject tables")
+    print(f"{subjects} subjects x {lookups} lookups | per-table scans {per_table:8.3f}s | "
+          f"indexed join {indexed:8.3f}s | speedup {per_table / indexed:6.1f}x")
+    return {"per_table_s": per_table, "indexed_s": indexed}
+
+
+def bench_study_order(subjects=200, topics_per_subject=30, readers=32, requests_per_reader=150, hot_subjects=10,
+                      hot_share=0.9, k=10, seed=0):
+    """Load test of the study-order API on SQLite: requests/s and latency percentiles, with and without the cache.
+
+    Most reads go to a few hot subjects, as students keep opening the same courses. Readers
+    keep one connection open each and use http.client, which costs the client side less
+    than requests while both sides share this process.
+    """
+    import http.client
+    import threading
+    from urllib.parse import urlencode
+
+    import db_handler
+    import metrics
+    import requests
+    from db_handler import DatabaseHandler, SQLiteBackend
+    from study_order import StudyOrderCache, StudyOrderServer
+
+    rng = random.Random(seed)
+    names = [f"subject {s}" for s in range(subjects)]
+    rows = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SQLiteBackend(os.path.join(tmp, "edumate.db"))
+        with DatabaseHandler(backend) as db:
+            for name in names:
+                topics = synthetic_topics(topics_per_subject, rng)
+                db.insert_scraped_topics(name, [(topic, f"records/{topic}.pdf", rank, rng.uniform(0, 30))
+                                                for rank, topic in enumerate(topics, 1)])
+
+        for label, capacity in (("uncached", 0), ("cached", 256)):
+            with StudyOrderServer(StudyOrderCache(backend, capacity=capacity), port=0) as server:
+                before = metrics.snapshot()
+                latencies, failures, lock = [], [], threading.Lock()
+                barrier = threading.Barrier(readers + 1)
+
+                def reader(i):
+                    reader_rng = random.Random(seed * 1000 + i)
+                    seen = []
+                    connection = http.client.HTTPConnection(*server.server.server_address)
+                    barrier.wait()
+                    for _ in range(requests_per_reader):
+                        hot = reader_rng.random() < hot_share
+                        name = reader_rng.choice(names[:hot_subjects] if hot else names)
+                        start = time.perf_counter()
+                        connection.request("GET", "/study-order?" + urlencode({"subject": name, "k": k}))
+                        response = connection.getresponse()
+                        body = response.read()
+                        seen.append(time.perf_counter() - start)
+                        if response.status != 200 or len(json.loads(body)["topics"]) != k:
+                            failures.append(response.status)
+                    connection.close()
+                    with lock:
+                        latencies.extend(seen)
+
+                threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+                for thread in threads:
+                    thread.start()
+                barrier.wait()
+                start = time.perf_counter()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                if failures:
+                    raise AssertionError(f"{len(failures)} study-order requests failed ({label})")
+                db_reads = sum(histogram["count"] for series, histogram in
+                               metrics.delta(metrics.snapshot(), before)["histograms"].items()
+                               if series.startswith('span_seconds{span="db_read"'))
+
+                # A write must show up in the next read when made in this process and, with the cache's write
+                # listener detached, as from another one (the GUI or batch.py), once the version is checked again.
+                for listening in (True, False):
+                    if not listening:
+                        db_handler.remove_write_listener(server.cache.on_write)
+                    requests.get(f"{server.url}/study-order", params={"subject": names[0], "k": 1})
+                    with DatabaseHandler(backend) as db:
+                        last_topic = db.top_topics(names[0])[-1][0]
+                        db.insert_scraped_topics(names[0], [(last_topic, f"records/{last_topic}.pdf", 0)])
+                    if not listening:
+                        time.sleep(server.cache.check_interval)  # Other writers show up after the next version check.
+                    first = requests.get(f"{server.url}/study-order", params={"subject": names[0], "k": 1}).json()
+                    if first["topics"][0]["topic"] != last_topic:
+                        raise AssertionError(f"Study order served stale data after a write ({label})")
+                    with DatabaseHandler(backend) as db:
+                        db.insert_scraped_topics(names[0], [(last_topic, f"records/{last_topic}.pdf", topics_per_subject)])
+                db_handler.add_write_listener(server.cache.on_write)
+
+                hit_rate = server.cache.hits / max(1, server.cache.hits + server.cache.misses)
+                # The lookup alone, without HTTP, over the same mix of subjects.
+                lookup_start = time.perf_counter()
+                for i in range(1000):
+                    server.cache.study_order(names[i % hot_subjects] if i % 10 else names[i % subjects], k)
+                lookup_us = (time.perf_counter() - lookup_start) * 1000
+
+                latencies.sort()
+                rows[label] = {"requests": len(latencies), "rps": len(latencies) / elapsed, "lookup_us": lookup_us,
+                               "p50_ms": 1000 * latencies[len(latencies) // 2],
+                               "p99_ms": 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+                               "hit_rate": hit_rate, "db_reads": db_reads}
+            print(f"{label:>8} | {readers} readers | {rows[label]['rps']:8.0f} req/s | p50 {rows[label]['p50_ms']:7.2f} ms | "
+                  f"p99 {rows[label]['p99_ms']:7.2f} ms | hit rate {rows[label]['hit_rate']:.0%} | "
+                  f"{rows[label]['db_reads']} db reads | "
+                  f"lookup alone {rows[label]['lookup_us']:6.1f} us")
+    return rows
+
+
+# ----------------------- Streaming Pipeline -----------------------
+def bench_pipeline(limit=10, ollama_latency=0.05, wiki_latency=0.1, video_latency=0.1, notes_chars=100_000):
+    """Time to the first stored topic PDF and total time: staged file handoff versus the streaming pipeline."""
+    import cleaning
+    import extraction
+    import scraping
+    from content_store import ContentStore
+    from db_handler import DatabaseHandler, SQLiteBackend
+    from pipeline import SubjectPipeline
+
+    with open(os.path.join(FIXTURES_DIR, "labelled_cdp_topics.json"), "r", encoding="utf-8") as f:
+        candidates = [entry["candidate"] for entry in json.load(f)["topics"]]
+    notes_text = synthetic_notes(candidates, notes_chars, random.Random(0))
+    adjacency_list, _ = extraction.create_adjacency_list(candidates, notes_text, [])
+    study_order = [topic for topic, _ in extraction.rank_topics_with_pagerank(adjacency_list)]
+
+    def fetch_videos(topic):
+        time.sleep(video_latency)
+        return [(f"{topic} explained", f"https://www.youtube.com/watch?v={abs(hash(topic)) % 10 ** 8}")]
+
+    rows = {}
+    with FakeOllama(latency=ollama_latency) as ollama, FakeWikipedia(latency=wiki_latency) as wiki, \
+            tempfile.TemporaryDirectory() as tmp:
+        def render(topic, content, videos):
+            return scraping.save_to_pdf(topic, content, videos, records_dir=os.path.join(tmp, "records"))
+
+        # The old flow: clean every candidate, then scrape the top topics, then render and store them.
+        with DatabaseHandler(SQLiteBackend(os.path.join(tmp, "staged.db"))) as db:
+            start = time.perf_counter()
+            topics = cleaning.clean_list(study_order, base_url=ollama.url, cache=cleaning.VerdictCache(None))
+            topics = sorted(topics[:limit])
+            store = ContentStore(os.path.join(tmp, "staged_store"))
+            first, stored = None, []
+            for data in scraping.scrape_data(topics, base_url=wiki.url, store=store):
+                pdf_path = render(data['topic'], data['content'], fetch_videos(data['topic']))
+                first = first or time.perf_counter() - start
+                stored.append((data['topic'], pdf_path))
+            db.insert_scraped_topics("staged", stored)
+            rows["staged"] = {"first_s": first, "total_s": time.perf_counter() - start, "artifacts": len(stored)}
+
+        with DatabaseHandler(SQLiteBackend(os.path.join(tmp, "pipeline.db"))) as db:
+            wiki_requests = wiki.page_views
+            subject_pipeline = SubjectPipeline("pipeline", limit=limit, db=db, store=ContentStore(os.path.join(tmp, "store")),
+                                               base_url=wiki.url, rate=0, ollama_url=ollama.url,
+                                               verdict_cache=cleaning.VerdictCache(None),
+                                               fetch_videos=fetch_videos, render=render,
+                                               records_dir=os.path.join(tmp, "records"),
+                                               metrics_dir=os.path.join(tmp, "metrics"))
+            artifacts = subject_pipeline.run_topics(study_order)
+            stats = subject_pipeline.stats
+            rows["pipeline"] = {"first_s": stats.first_artifact_s, "total_s": stats.total_s, "artifacts": len(artifacts)}
+            if sorted(artifact.topic.topic for artifact in artifacts) != topics:
+                raise AssertionError("Pipeline kept different topics than the staged flow")
+            # Kept topics are fetched per clean batch and stored in one transaction per subject.
+            writes = subject_pipeline.run_metrics["histograms"].get('span_seconds{span="db_write",table="subject_topic"}')
+            if writes is None or writes["count"] != 1:
+                raise AssertionError(f"Pipeline stored its topics in {writes and writes['count']} transactions, not 1")
+            print(f"Wikipedia requests: {wiki.page_views - wiki_requests} for {len(artifacts)} topics")
+            print(stats.summary())
+
+    for label, row in rows.items():
+        print(f"{label:>8} | first artifact {row['first_s']:8.3f}s | total {row['total_s']:8.3f}s | "
+              f"{row['artifacts'] / row['total_s']:6.2f} artifacts/s")
+    return rows
+
+
+# ----------------------- Instrumentation -----------------------
+def bench_metrics(iterations=200_000):
+    """Cost of a metrics span and a counter increment, with the registry on and off."""
+    from metrics import Metrics
+
+    rows = {}
+    for label, enabled in (("enabled", True), ("disabled", False)):
+        registry = Metrics(enabled=enabled, profile="")
+        start = time.perf_counter()
+        for _ in range(iterations):
+            with registry.span("bench", host="localhost"):
+                pass
+        span_ns = (time.perf_counter() - start) / iterations * 1e9
+        start = time.perf_counter()
+        for _ in range(iterations):
+            registry.inc("bench", stage="bench")
+        inc_ns = (time.perf_counter() - start) / iterations * 1e9
+        rows[label] = {"span_ns": span_ns, "inc_ns": inc_ns}
+        print(f"{label:>8} | span {span_ns:7.0f} ns | counter {inc_ns:7.0f} ns")
+    return rows
+
+
+# ----------------------- Corpus TF-IDF -----------------------
+def bench_corpus_index(subjects=100, topics_per_subject=60, notes_chars=50_000, seed=0):
+    """Per-subject TfidfVectorizer fits versus the corpus index: scoring every subject,
+    then replacing one subject's notes (incremental update against a full corpus refit)."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    from corpus_index import CorpusIndex
+
+    rng = random.Random(seed)
+    vocabulary = synthetic_topics(topics_per_subject * 4, rng)
+    corpus = {}
+    for s in range(subjects):
+        topics = rng.sample(vocabulary, topics_per_subject)
+        corpus[f"subject {s}"] = (topics, synthetic_notes(topics, notes_chars, rng))
+    counts = {name: TopicMatcher(topics).match(notes).counts for name, (topics, notes) in corpus.items()}
+
+    start = time.perf_counter()
+    for topics, notes in corpus.values():
+        TfidfVectorizer(vocabulary=topics).fit_transform([notes])
+    legacy_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = CorpusIndex(os.path.join(tmp, "corpus_index.npz"))
+        start = time.perf_counter()
+        for name, (topics, _) in corpus.items():
+            index.add_subject(name, {topic: counts[name].get(topic, 0) for topic in topics})
+            index.tfidf(name, topics)
+        index_time = time.perf_counter() - start
+
+        # Replace one subject: the index updates a row; a corpus-wide vectorizer refits on every document.
+        name, (topics, _) = next(iter(corpus.items()))
+        start = time.perf_counter()
+        index.add_subject(name, {topic: 2 * counts[name].get(topic, 0) for topic in topics})
+        index.tfidf(name, topics)
+        index.save()
+        update_time = time.perf_counter() - start
+        size = os.path.getsize(index.path)
+
+    start = time.perf_counter()
+    TfidfVectorizer(vocabulary=vocabulary, ngram_range=(1, 4)).fit_transform(notes for _, notes in corpus.values())
+    refit_time = time.perf_counter() - start
+
+    print(f"{subjects} subjects | per-subject fits {legacy_time:8.3f}s | index add+score {index_time:8.3f}s | "
+          f"one-subject update {1000 * update_time:7.1f} ms (full refit {1000 * refit_time:7.1f} ms) | {size} bytes on disk")
+    return {"legacy_s": legacy_time, "index_s": index_time, "update_s": update_time, "refit_s": refit_time,
+            "bytes": size}
+
+
+# ----------------------- YouTube Lookups -----------------------
+def bench_video_lookup(subjects=5, topics_per_subject=10, shared=0.5, latency=0.1, quota=2500, seed=0):
+    """Serial uncached searches per subject versus the concurrent cached VideoLookup, against a quota-limited stub."""
+    import requests
+    from local_services import FakeYouTube
+    from video_lookup import VideoLookup, VideoLookupStats
+
+    rng = random.Random(seed)
+    common = [f"{title} {i}" for i, title in enumerate(SAMPLE_TITLES)][:int(topics_per_subject * shared)]
+    plan = [common + [f"{rng.choice(SAMPLE_TITLES)} {s}-{i}" for i in range(topics_per_subject - len(common))]
+            for s in range(subjects)]
+    rows = {}
+    with FakeYouTube(latency=latency) as youtube:
+        start = time.perf_counter()
+        for topics in plan:
+            for topic in topics:
+                requests.get(f"{youtube.url}/youtube/v3/search",
+                             params={"part": "snippet", "q": topic, "maxResults": 5, "type": "video", "key": "test"})
+        rows["serial"] = {"seconds": time.perf_counter() - start, "units": youtube.units, "hit_rate": 0.0}
+
+    with FakeYouTube(latency=latency, quota=quota) as youtube, tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "youtube_cache.json")
+        for label in ("lookup", "lookup rerun"):
+            with VideoLookup(api_key="test", base_url=youtube.url, cache_path=cache_path, rate=0) as lookup:
+                stats = VideoLookupStats()
+                start = time.perf_counter()
+                results = [lookup.search_many(topics, max_workers=8, stats=stats) for topics in plan]
+                empty = sum(not videos for result in results for videos in result.values())
+                rows[label] = {"seconds": time.perf_counter() - start, "units": stats.units, "hit_rate": stats.hit_rate,
+                               "quota_denied": stats.quota_denied, "empty_results": empty}
+                print(f"{label}: {stats.summary()}")
+    for label, row in rows.items():
+        print(f"{label:>12} | {row['seconds']:8.3f}s | {row['units']:6} quota units | hit rate {row['hit_rate']:.0%}")
+    return rows
+
+
+# ----------------------- PDF Rendering -----------------------
+def _legacy_save_to_pdf(topic, content, youtube_videos, records_dir):
+    # save_to_pdf as it was: per-character Unicode folding and a direct write on every run.
+    import unicodedata
+    from fpdf import FPDF
+
+    def remove_unicode(text):
+        return ''.join(c if ord(c) < 128 else unicodedata.normalize('NFKD', c).encode('ASCII', 'ignore').decode()
+                       for c in text)
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    topic, content = remove_unicode(topic), remove_unicode(content)
+    pdf.set_font("Arial", style='', size=16)
+    pdf.cell(200, 10, topic, ln=True, align='C')
+    pdf.ln(10)
+    pdf.set_font("Arial", size=12)
+    pdf.multi_cell(0, 10, content)
+    pdf.ln(10)
+    pdf.set_font("Arial", style='', size=14)
+    pdf.cell(0, 10, "Top YouTube Videos:", ln=True)
+    pdf.set_font("Arial", size=12)
+    for title, link in youtube_videos:
+        pdf.multi_cell(0, 10, f"{remove_unicode(title)}\n{remove_unicode(link)}\n")
+        pdf.ln(10)
+    os.makedirs(records_dir, exist_ok=True)
+    file_name = f"{records_dir}/{topic.replace(' ', '_')}.pdf"
+    pdf.output(file_name, "F")
+    return file_name
+
+
+def bench_render(topic_count=40, paragraphs=40):
+    """Serial legacy rendering versus pooled rendering, an unchanged rerun and a combined study pack."""
+    import render
+    from local_services import canned_article
+
+    documents = [(f"{title} {i}", " ".join(canned_article(f"{title} {i} – café", paragraphs)),
+                  [(f"{title} explained", f"https://www.youtube.com/watch?v={i:08d}")] * 5)
+                 for i, title in enumerate(SAMPLE_TITLES * (topic_count // len(SAMPLE_TITLES) + 1))][:topic_count]
+    rows = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        for document in documents:
+            _legacy_save_to_pdf(*document, os.path.join(tmp, "legacy"))
+        rows["legacy"] = time.perf_counter() - start
+
+        records_dir = os.path.join(tmp, "records")
+        for label in ("pooled", "unchanged rerun"):
+            start = time.perf_counter()
+            results = render.render_many(documents, records_dir)
+            rows[label] = time.perf_counter() - start
+            rows[f"{label} rendered"] = sum(rendered for _, rendered in results)
+
+        start = time.perf_counter()
+        render.render_study_pack("benchmark", documents, records_dir)
+        rows["study pack"] = time.perf_counter() - start
+    print(f"{topic_count} topics | legacy {rows['legacy']:8.3f}s | pooled {rows['pooled']:8.3f}s | "
+          f"unchanged rerun {rows['unchanged rerun']:8.3f}s ({rows['unchanged rerun rendered']} rendered) | "
+          f"study pack {rows['study pack']:8.3f}s")
+    return rows
+
+
+# ----------------------- Startup Cost -----------------------
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+# Packages that take a large share of a cold start; entry points load them on first use only.
+HEAVY_MODULES = ("tkinter", "matplotlib", "seaborn", "sklearn", "networkx", "scipy", "fitz", "nltk", "fpdf",
+                 "bs4", "langchain", "langchain_core", "langchain_ollama")
+# Cumulative import time each entry point may take, in milliseconds; roughly 3x a warm run.
+IMPORT_BUDGETS_MS = {"db_handler": 300, "cleaning": 150, "extraction": 350, "summarizer": 350,
+                     "scraping": 700, "pipeline": 750, "batch": 900}
+
+
+def measure_import(module):
+    """Imports `module` in a fresh interpreter under -X importtime.
+
+    Returns (cumulative milliseconds, set of top-level packages it loaded).
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    cumulative, loaded = None, set()
+    for line in completed.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$", line)
+        if not match:
+            continue
+        loaded.add(match.group(4).split(".")[0])
+        if match.group(4) == module and len(match.group(3)) == 1:
+            cumulative = int(match.group(2)) / 1000
+    return cumulative, loaded
+
+
+def bench_import_time(budgets=None, repeats=5):
+    """Startup cost per entry point; fails if one loads a heavy package eagerly or exceeds its budget."""
+    budgets = budgets or IMPORT_BUDGETS_MS
+    rows, failures = {}, []
+    for module, budget in budgets.items():
+        runs = [measure_import(module) for _ in range(repeats)]
+        best = min(ms for ms, _ in runs)
+        heavy = sorted(set(HEAVY_MODULES) & set.union(*(loaded for _, loaded in runs)))
+        rows[module] = {"import_ms": best, "budget_ms": budget, "heavy_modules": heavy}
+        print(f"{module:>11} | {best:8.1f} ms (budget {budget} ms) | heavy modules: {', '.join(heavy) or 'none'}")
+        if best > budget:
+            failures.append(f"{module} imports in {best:.0f} ms, over its {budget} ms budget")
+        if heavy:
+            failures.append(f"{module} eagerly imports {', '.join(heavy)}")
+    if failures:
+        raise AssertionError("Startup regressed: " + "; ".join(failures))
+    return rows
+
+
+if __name__ == "__main__":
+    bench_topic_matching()
+    bench_pagerank()
+    bench_clean_list()
+    bench_scrape_data()
+    bench_wikipedia_backends()
+    bench_summarizer()
+    bench_pdf_extraction()
+    bench_prefilter()
+    bench_db_inserts()
+    bench_topic_queries()
+    bench_study_order()
+    bench_pipeline()
+    bench_corpus_index()
+    bench_video_lookup()
+    bench_render()
+    bench_metrics()
+    bench_import_time()
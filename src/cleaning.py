@@ -1,25 +1,181 @@
-from langchain_ollama import OllamaLLM
-from langchain.prompts import PromptTemplate
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def clean_list(topics):
+import metrics
+
+MODEL_NAME = "llama3.1:latest"
+VERDICT_CACHE_PATH = "topic_verdicts.json"
+
+SINGLE_TEMPLATE = ("You should return only one word. 'yes' or 'no'. 'Yes' if the given input is like title of a concept, "
+                   "otherwise if it's a noise or broken sentence or unelated, return 'No'.\nTitle: {title}\nAnswer:")
+BATCH_TEMPLATE = ("For each numbered title below decide if it is like the title of a concept ('yes'), "
+                  "or if it's a noise or broken sentence or unrelated ('no').\n"
+                  "Return only a JSON object mapping each number to 'yes' or 'no', e.g. {{\"1\": \"yes\", \"2\": \"no\"}}.\n"
+                  "Titles:\n{titles}\nAnswer:")
+
+
+def normalize_title(title):
+    return " ".join(title.lower().split())
+
+
+# ----------------------- Verdict Cache -----------------------
+class VerdictCache:
+    """Persistent yes/no verdicts keyed by model name and normalized title."""
+
+    def __init__(self, path=VERDICT_CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.verdicts = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.verdicts = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Ignoring unreadable verdict cache {path}: {e}")
+
+    @staticmethod
+    def key(model, title):
+        return f"{model}::{normalize_title(title)}"
+
+    def get(self, model, title):
+        return self.verdicts.get(self.key(model, title))
+
+    def put(self, model, title, verdict):
+        with self.lock:
+            self.verdicts[self.key(model, title)] = verdict
+            self.dirty = True
+
+    def save(self):
+        """Writes the verdicts if any were added since the last save."""
+        if not self.path:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            # Unique per writer: the GUI and batch.py may save the same file at once.
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.verdicts, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+
+class CleanStats:
+    """Cache hits/misses, model calls and per-batch latency for one clean_list run."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.llm_calls = 0
+        self.batch_latencies = []
+        self.lock = threading.Lock()
+
+    def record_batch(self, latency, calls):
+        with self.lock:
+            self.batch_latencies.append(latency)
+            self.llm_calls += calls
+
+    def summary(self):
+        latencies = self.batch_latencies
+        avg = sum(latencies) / len(latencies) if latencies else 0.0
+        return (f"cache hits: {self.hits}, misses: {self.misses}, LLM calls: {self.llm_calls}, "
+                f"batches: {len(latencies)}, avg batch latency: {avg:.2f}s, max: {max(latencies, default=0.0):.2f}s")
+
+
+# ----------------------- LLM Classification -----------------------
+def parse_batch_answer(response, count):
+    """Reads {"1": "yes", ...} (or numbered 'n. yes' lines) into {index: bool}."""
+    verdicts = {}
+    match = re.search(r"\{.*\}", response, re.DOTALL)
+    if match:
+        try:
+            for key, value in json.loads(match.group(0)).items():
+                if str(key).strip().isdigit():
+                    verdicts[int(key)] = str(value).strip().lower() == "yes"
+        except json.JSONDecodeError:
+            pass
+    if not verdicts:
+        for number, answer in re.findall(r"(\d+)\s*[.:)\-]\s*\"?(yes|no)\b", response, re.IGNORECASE):
+            verdicts[int(number)] = answer.lower() == "yes"
+    return {i: verdict for i, verdict in verdicts.items() if 1 <= i <= count}
+
+
+def classify_single(chatbot, title):
+    response = chatbot.invoke({"title": title})
+    return response.strip().lower() == "yes"
+
+
+def classify_batch(batch_chatbot, single_chatbot, titles, stats):
+    """Classifies a batch in one prompt; titles without a usable answer fall back to single prompts."""
+    start = time.perf_counter()
+    calls = 1
+    with metrics.span("llm_batch"):
+        if len(titles) == 1:
+            results = {titles[0]: classify_single(single_chatbot, titles[0])}
+        else:
+            listing = "\n".join(f"{i}. {title}" for i, title in enumerate(titles, 1))
+            verdicts = parse_batch_answer(batch_chatbot.invoke({"titles": listing}), len(titles))
+            results = {}
+            for i, title in enumerate(titles, 1):
+                if i not in verdicts:
+                    verdicts[i] = classify_single(single_chatbot, title)
+                    calls += 1
+                results[title] = verdicts[i]
+    stats.record_batch(time.perf_counter() - start, calls)
+    metrics.inc("llm_calls", calls)
+    return results
+
+
+def clean_list(topics, batch_size=20, max_workers=4, model=MODEL_NAME, base_url=None,
+               cache=None, stats=None, save=True):
+    """Keeps the topics the LLM judges to be concept titles.
+
+    Titles are sent `batch_size` per prompt (1 keeps the original one-title prompt),
+    with up to `max_workers` prompts in flight. Verdicts are cached per model and
+    normalized title so repeated topics never reach the model again. Callers that
+    classify in many small calls pass `save=False` and save the cache once at the end.
+    """
     print("clean process initiate.")
-    ollama_llm = OllamaLLM(model="llama3.1:latest")
-    prompt = PromptTemplate(
-        input_variables=["title"],
-        template="You should return only one word. 'yes' or 'no'. 'Yes' if the given input is like title of a concept, "
-                 "otherwise if it's a noise or broken sentence or unelated, return 'No'.\nTitle: {title}\nAnswer:"
-    )
-    chatbot = prompt | ollama_llm
-    clean_topics = []
-    for topic in topics:
-        response = chatbot.invoke({"title": topic})
-        response_text = response.strip().lower()
-        if response_text == "yes":
-            clean_topics.append(topic)
-    print("Clean process complete.")
+    cache = cache if cache is not None else VerdictCache()
+    stats = stats if stats is not None else CleanStats()
+    base_url = base_url or os.getenv("OLLAMA_HOST")
+
+    pending = [topic for topic in topics if cache.get(model, topic) is None]
+    stats.hits += len(topics) - len(pending)
+    stats.misses += len(pending)
+    metrics.inc("cache_lookups", len(topics) - len(pending), cache="verdicts", result="hit")
+    metrics.inc("cache_lookups", len(pending), cache="verdicts", result="miss")
+    pending = list({normalize_title(topic): topic for topic in pending}.values())
+
+    if pending:
+        # LangChain takes seconds to import; fully cached runs never load it.
+        from langchain.prompts import PromptTemplate
+        from langchain_ollama import OllamaLLM
+
+        ollama_llm = OllamaLLM(model=model, base_url=base_url)
+        single_chatbot = PromptTemplate(input_variables=["title"], template=SINGLE_TEMPLATE) | ollama_llm
+        batch_chatbot = PromptTemplate(input_variables=["titles"], template=BATCH_TEMPLATE) | ollama_llm
+        batches = [pending[i:i + max(1, batch_size)] for i in range(0, len(pending), max(1, batch_size))]
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [executor.submit(classify_batch, batch_chatbot, single_chatbot, batch, stats)
+                       for batch in batches]
+            for future in futures:
+                for title, verdict in future.result().items():
+                    cache.put(model, title, verdict)
+        if save:
+            cache.save()
+
+    clean_topics = [topic for topic in topics if cache.get(model, topic)]
+    metrics.inc("topics", len(clean_topics), step="kept")
+    print(f"Clean process complete. {stats.summary()}")
     return clean_topics
 
 
 if __name__ == "__main__":
     inputs = ['0-1 knapsack problem', 'algorithms', 'and strong connectivity', 'annamalai', 'application of these design techniques for real-world', 'applications', 'applications of bfs:', 'applications of dfs', 'as examples', 'backtracking', 'bellman ford', 'biconnected components', 'blind search', 'boyer moore', 'branch and bound 0-1 knapsack', 'bucket', 'class', 'closest pair', 'comparison of', 'connectivity and connected components and cycles in undirected graphs', 'convex hull etc', 'course development plan: 23cse214', 'course objectives:', 'course overview:', 'cuts maximum bipartite matching', 'cycles in directed graphs', 'definitions p', 'descent algorithm', 'distance', 'divide and conquer', 'dynamic programming:', 'examples', 'examples of p and np', 'faculty: dr', 'fibonacci numbers', 'flow algorithms maximum flow', "floyd warshall's", 'fractional knapsack', 'gradient', 'graph algorithms', 'graph traversal', 'greedy algorithm', 'heap', 'heuristic searching algorithms', 'hill climbing algorithm', 'huffman coding etc as examples', 'including problems incorporating combinatorics as examples', 'insertion', 'introduction', 'introduction and review-review of asymptotic notation', 'introduction to np', 'kmp', 'long integer multiplication', 'longest common subsequence', 'master', 'matrix chain multiplication', 'maximum sub array sum', 'merge sort', 'method', 'motivation and types of notations', 'n- queen problem', 'network flow and matching', 'np', 'np hard', 'optimal binary search tree and other problems', 'parallel algorithms', 'path algorithms: shortest path algorithms along with analysis', 'pivot based strategies', 'problem', 'problem solving and analysis of complexity and correctness of algorithms', 'quick select and binary search type strategies', 'quick sort', 'r', 'rabin karp', 'recurrence relations and methods to solve them: recursion tree', 'review of minimum spanning tree', 'review of sorting: bubble', 'sat problem np complete', 'scalable', 'selection', 'sorting algorithms', 'specifically in', 'string matching', 'subject name: design and analysis of algorithms', 'subset sum as some', 'substitution', 'syllabus', 'task scheduling problem', 'terms of algorithm design techniques', 'this course aims to provide the fundamentals of algorithm design and analysis', 'topological sort', 'unit 1', 'unit 2', 'unit 3', 'with analysis and']
-    ans = clean_list(inputs)
\ No newline at end of file
+    ans = clean_list(inputs)
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+import metrics
+
+CONTENT_STORE_DIR = "content_store"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+ARTIFACTS = ("page", "summary", "videos", "pdf_path")
+
+
+def normalize_topic(topic):
+    return " ".join(topic.lower().split())
+
+
+# ----------------------- Cross-Subject Content Store -----------------------
+class ContentStore:
+    """Per-topic artifacts shared by every subject, stored as one JSON file per normalized topic.
+
+    An entry holds the fetched page (text, URL and ETag/Last-Modified validators),
+    the summary, the YouTube video list and the rendered PDF path. Each artifact
+    expires `ttl` seconds after it was stored; expired pages keep their validators
+    so they can be revalidated with a conditional request. When the store grows
+    past `max_bytes` the least recently used entries are evicted.
+    """
+
+    def __init__(self, root=CONTENT_STORE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self.entries = {}
+        self.hits = Counter()
+        self.misses = Counter()
+        self.bytes_saved = 0
+        os.makedirs(root, exist_ok=True)
+        self.sizes = {entry.name: entry.stat().st_size for entry in os.scandir(root) if entry.name.endswith(".json")}
+
+    def path(self, topic):
+        digest = hashlib.sha256(normalize_topic(topic).encode("utf-8")).hexdigest()
+        return os.path.join(self.root, f"{digest}.json")
+
+    def get(self, topic):
+        """Returns the raw entry for a topic (fresh or not), or None."""
+        path = self.path(topic)
+        with self.lock:
+            if path in self.entries:
+                return self.entries[path]
+            if not os.path.exists(path):
+                return None
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Ignoring unreadable store entry {path}: {e}")
+                return None
+            self.entries[path] = entry
+            return entry
+
+    def is_fresh(self, entry, artifact):
+        stored_at = entry.get("stored_at", {}).get(artifact)
+        return stored_at is not None and time.time() - stored_at < self.ttl
+
+    def lookup(self, topic, artifact):
+        """Returns a fresh artifact and counts the hit, or None and counts the miss."""
+        entry = self.get(topic)
+        value = entry.get(artifact) if entry else None
+        if value is not None and self.is_fresh(entry, artifact):
+            if artifact == "pdf_path" and not os.path.exists(value):
+                value = None
+        else:
+            value = None
+        with self.lock:
+            if value is not None:
+                try:
+                    os.utime(self.path(topic))
+                except FileNotFoundError:
+                    self.forget(self.path(topic))  # Evicted by another process sharing the store.
+                    value = None
+            if value is None:
+                self.misses[artifact] += 1
+            else:
+                self.hits[artifact] += 1
+                self.bytes_saved += self.artifact_bytes(entry, artifact)
+        metrics.inc("cache_lookups", cache=f"content_{artifact}", result="miss" if value is None else "hit")
+        return value
+
+    @staticmethod
+    def artifact_bytes(entry, artifact):
+        # What a hit avoids: downloading the page, or re-rendering the PDF.
+        if artifact in ("page", "summary"):
+            return entry.get("page", {}).get("bytes", 0)
+        if artifact == "pdf_path":
+            return os.path.getsize(entry["pdf_path"]) if os.path.exists(entry["pdf_path"]) else 0
+        return len(json.dumps(entry.get(artifact)))
+
+    def put(self, topic, **artifacts):
+        """Stores artifacts for a topic. A new summary or video list drops the rendered PDF."""
+        path = self.path(topic)
+        now = time.time()
+        with self.lock:
+            entry = dict(self.get(topic) or {"topic": normalize_topic(topic), "stored_at": {}})
+            entry["stored_at"] = dict(entry.get("stored_at", {}))
+            for artifact, value in artifacts.items():
+                if artifact not in ARTIFACTS:
+                    raise ValueError(f"Unknown artifact: {artifact}")
+                if artifact in ("summary", "videos") and entry.get(artifact) != value:
+                    entry.pop("pdf_path", None)
+                    entry["stored_at"].pop("pdf_path", None)
+                entry[artifact] = value
+                entry["stored_at"][artifact] = now
+            self.write(path, entry)
+            self.entries[path] = entry
+            self.evict()
+
+    def touch(self, topic, artifact):
+        """Marks an artifact as fresh again, e.g. after a 304 Not Modified."""
+        with self.lock:
+            entry = self.get(topic)
+            if entry is None:
+                return
+            entry["stored_at"][artifact] = time.time()
+            self.write(self.path(topic), entry)
+
+    def write(self, path, entry):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        self.sizes[os.path.basename(path)] = os.path.getsize(path)
+
+    def forget(self, path):
+        self.entries.pop(path, None)
+        self.sizes.pop(os.path.basename(path), None)
+
+    def evict(self):
+        if sum(self.sizes.values()) <= self.max_bytes:
+            return
+        last_used = {}
+        for name in list(self.sizes):
+            path = os.path.join(self.root, name)
+            try:
+                last_used[name] = os.path.getmtime(path)
+            except FileNotFoundError:
+                self.forget(path)  # Already evicted by another process sharing the store.
+        by_last_use = sorted(last_used, key=last_used.get)
+        total = sum(self.sizes.values())
+        for name in by_last_use:
+            if total <= self.max_bytes:
+                break
+            path = os.path.join(self.root, name)
+            total -= self.sizes.pop(name)
+            self.entries.pop(path, None)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def report(self):
+        lines = ["Content store:"]
+        for artifact in ARTIFACTS:
+            hits, misses = self.hits[artifact], self.misses[artifact]
+            if hits or misses:
+                lines.append(f" - {artifact}: {hits}/{hits + misses} hits ({hits / (hits + misses):.0%})")
+        lines.append(f" - bytes saved: {self.bytes_saved}")
+        return "\n".join(lines)
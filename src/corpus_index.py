@@ -0,0 +1,135 @@
+import os
+import threading
+
+import numpy as np
+
+CORPUS_INDEX_PATH = "corpus_index.npz"
+
+
+def normalize_term(topic):
+    return " ".join(topic.lower().split())
+
+
+def tfidf_scores(counts, document_frequency=None, documents=1):
+    """TF-IDF of one document's topic counts, with smoothed IDF and L2 normalization like TfidfVectorizer.
+
+    `document_frequency` maps a topic to the number of documents mentioning it;
+    without it the document is treated as a corpus of one.
+    """
+    topics = list(counts)
+    tf = np.array([counts[topic] for topic in topics], dtype=float)
+    df = np.array([(document_frequency or {}).get(topic, 1 if counts[topic] else 0) for topic in topics], dtype=float)
+    weights = tf * (np.log((1 + documents) / (1 + df)) + 1)
+    norm = np.linalg.norm(weights)
+    return dict(zip(topics, (weights / norm if norm else weights).tolist()))
+
+
+# ----------------------- Corpus TF-IDF Index -----------------------
+class CorpusIndex:
+    """Topic mention counts of every processed subject's notes, as one sparse subject x topic matrix.
+
+    The vocabulary only grows, so adding or replacing a subject touches its own
+    row and the document frequencies of its topics; nothing is refit. Scores use
+    the same smoothed IDF and L2 normalization as scikit-learn's TfidfVectorizer,
+    over the whole corpus instead of a single document. The matrix, vocabulary
+    and subject names are saved together in one .npz file.
+    """
+
+    def __init__(self, path=CORPUS_INDEX_PATH):
+        self.path = path
+        self.lock = threading.RLock()
+        self.vocabulary = {}
+        self.rows = {}
+        self.document_frequency = np.zeros(0, dtype=np.int64)
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, subject_name):
+        return subject_name in self.rows
+
+    def term_ids(self, topics, grow=False):
+        ids = []
+        for topic in topics:
+            term = normalize_term(topic)
+            if term not in self.vocabulary and grow:
+                self.vocabulary[term] = len(self.vocabulary)
+            ids.append(self.vocabulary.get(term, -1))
+        if grow and len(self.vocabulary) > len(self.document_frequency):
+            self.document_frequency = np.concatenate(
+                [self.document_frequency, np.zeros(len(self.vocabulary) - len(self.document_frequency), dtype=np.int64)])
+        return np.array(ids, dtype=np.int64)
+
+    def add_subject(self, subject_name, counts):
+        """Adds or replaces a subject's {topic: mention count} row."""
+        with self.lock:
+            ids = self.term_ids(counts, grow=True)
+            values = np.array(list(counts.values()), dtype=np.float64)
+            totals = np.bincount(ids, weights=values, minlength=len(self.vocabulary))
+            term_ids = np.flatnonzero(totals)
+            self.remove_subject(subject_name)
+            self.rows[subject_name] = (term_ids, totals[term_ids])
+            self.document_frequency[term_ids] += 1
+
+    def remove_subject(self, subject_name):
+        with self.lock:
+            row = self.rows.pop(subject_name, None)
+            if row is not None:
+                self.document_frequency[row[0]] -= 1
+
+    def idf(self):
+        return np.log((1 + len(self.rows)) / (1 + self.document_frequency)) + 1
+
+    def tfidf(self, subject_name, topics):
+        """Returns {topic: TF-IDF score} of `topics` in a subject's notes, 0.0 for unseen ones."""
+        with self.lock:
+            row = self.rows.get(subject_name)
+            if row is None:
+                return {topic: 0.0 for topic in topics}
+            term_ids, counts = row
+            weights = counts * self.idf()[term_ids]
+            norm = np.linalg.norm(weights)
+            vector = np.zeros(len(self.vocabulary))
+            vector[term_ids] = weights / norm if norm else weights
+            ids = self.term_ids(topics)
+        return {topic: float(vector[i]) if i >= 0 else 0.0 for topic, i in zip(topics, ids)}
+
+    def matrix(self):
+        """The subject x topic count matrix (CSR) and its subject names, in insertion order."""
+        from scipy import sparse
+
+        with self.lock:
+            subjects = list(self.rows)
+            lengths = [len(self.rows[subject][0]) for subject in subjects]
+            indptr = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+            indices = np.concatenate([self.rows[subject][0] for subject in subjects] or [np.zeros(0, np.int64)])
+            data = np.concatenate([self.rows[subject][1] for subject in subjects] or [np.zeros(0)])
+            return sparse.csr_matrix((data, indices, indptr), shape=(len(subjects), len(self.vocabulary))), subjects
+
+    # ----------------------- Persistence -----------------------
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            matrix, subjects = self.matrix()
+            vocabulary = sorted(self.vocabulary, key=self.vocabulary.get)
+            tmp_path = f"{self.path}.{threading.get_ident()}.tmp.npz"
+            np.savez_compressed(tmp_path, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                                subjects=np.array(subjects, dtype=str), vocabulary=np.array(vocabulary, dtype=str))
+            os.replace(tmp_path, self.path)
+
+    def load(self):
+        try:
+            with np.load(self.path) as stored:
+                subjects, vocabulary = stored["subjects"].tolist(), stored["vocabulary"].tolist()
+                data, indices, indptr = stored["data"], stored["indices"], stored["indptr"]
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Ignoring unreadable corpus index {self.path}: {e}")
+            return
+        with self.lock:
+            self.vocabulary = {term: i for i, term in enumerate(vocabulary)}
+            self.rows = {subject: (indices[indptr[i]:indptr[i + 1]].astype(np.int64), data[indptr[i]:indptr[i + 1]])
+                         for i, subject in enumerate(subjects)}
+            self.document_frequency = np.bincount(indices, minlength=len(vocabulary)).astype(np.int64)
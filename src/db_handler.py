@@ -1,98 +1,414 @@
 import os
+import queue
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+
 import mysql.connector
-from mysql.connector import Error
-import json
+from mysql.connector import Error, pooling
+
+import metrics
+
+POOL_SIZE = 5
+# "sqlite:///path/to/file.db" switches every handler to SQLite; unset means MySQL.
+DATABASE_URL = os.getenv("EDUMATE_DB", "")
+DB_ERRORS = (Error, sqlite3.Error)
+
+# Tables already created in this process, keyed by (database, table).
+_created_tables = set()
+_created_tables_lock = threading.Lock()
+# Called with (database location, subject name) after a subject's rows change, e.g. to drop cached study orders.
+_write_listeners = []
+
+
+def add_write_listener(listener):
+    _write_listeners.append(listener)
+
+
+def remove_write_listener(listener):
+    if listener in _write_listeners:
+        _write_listeners.remove(listener)
+
+
+def notify_write(location, subject_name):
+    for listener in list(_write_listeners):
+        listener(location, subject_name)
+
+
+# ----------------------- Backends -----------------------
+class MySQLBackend:
+    name = "mysql"
+    placeholder = "%s"
+    primary_key = "INT AUTO_INCREMENT PRIMARY KEY"
+    _pool = None
+    # MySQLConnectionPool raises as soon as it is empty; handlers wait here for a free connection instead.
+    _slots = None
+    _lock = threading.Lock()
+
+    def __init__(self, pool_size=POOL_SIZE):
+        self.pool_size = pool_size
+        self.location = "mysql://localhost/edumate"
+
+    def get_connection(self):
+        with MySQLBackend._lock:
+            if MySQLBackend._pool is None:
+                MySQLBackend._pool = pooling.MySQLConnectionPool(
+                    pool_name="edumate",
+                    pool_size=self.pool_size,
+                    host='localhost',
+                    user='root',
+                    password=os.getenv("db_pass"),  # Update with your MySQL password
+                    database='edumate'
+                )
+                MySQLBackend._slots = threading.BoundedSemaphore(self.pool_size)
+        MySQLBackend._slots.acquire()
+        try:
+            return MySQLBackend._pool.get_connection()
+        except BaseException:
+            MySQLBackend._slots.release()
+            raise
+
+    def release(self, connection):
+        connection.close()  # Returns a pooled connection to the pool.
+        MySQLBackend._slots.release()
+
+    def upsert(self, table, columns, updates, key=None, coalesce=()):
+        # The conflict key comes from the table's UNIQUE/PRIMARY KEY, so `key` is unused here.
+        values = ", ".join([self.placeholder] * len(columns))
+        assignments = ", ".join(f"{column}=COALESCE(VALUES({column}), {column})" if column in coalesce
+                                else f"{column}=VALUES({column})" for column in updates)
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values}) ON DUPLICATE KEY UPDATE {assignments};"
+
+    def create_table(self, table, columns, indexes=()):
+        definitions = list(columns) + [f"INDEX {name} ({', '.join(cols)})" for name, cols in indexes]
+        return [f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(definitions)});"]
+
+    def table_exists_query(self):
+        return ("SELECT COUNT(*) FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s")
+
+    def column_exists_query(self):
+        return ("SELECT COUNT(*) FROM information_schema.columns "
+                "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s")
+
+
+class SQLiteBackend:
+    """SQLite stand-in for MySQL with the same handler interface, for tests and benchmarks."""
+
+    name = "sqlite"
+    placeholder = "?"
+    primary_key = "INTEGER PRIMARY KEY AUTOINCREMENT"
+    _pools = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self.location = f"sqlite:///{path}"
+
+    def get_connection(self):
+        with SQLiteBackend._lock:
+            pool = SQLiteBackend._pools.setdefault(self.path, queue.LifoQueue())
+        try:
+            return pool.get_nowait()
+        except queue.Empty:
+            return sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+
+    def release(self, connection):
+        SQLiteBackend._pools[self.path].put(connection)
+
+    def upsert(self, table, columns, updates, key=None, coalesce=()):
+        values = ", ".join([self.placeholder] * len(columns))
+        assignments = ", ".join(f"{column}=COALESCE(excluded.{column}, {column})" if column in coalesce
+                                else f"{column}=excluded.{column}" for column in updates)
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values}) "
+                f"ON CONFLICT({', '.join(key or columns[:1])}) DO UPDATE SET {assignments};")
 
+    def create_table(self, table, columns, indexes=()):
+        statements = [f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)});"]
+        statements += [f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(cols)});" for name, cols in indexes]
+        return statements
+
+    def table_exists_query(self):
+        return "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?"
+
+    def column_exists_query(self):
+        return "SELECT COUNT(*) FROM pragma_table_info(?) WHERE name = ?"
+
+
+def backend_from_url(url=None):
+    url = DATABASE_URL if url is None else url
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    return MySQLBackend()
+
+
+# ----------------------- Database Handler -----------------------
 class DatabaseHandler:
-    def __init__(self):
+    def __init__(self, backend=None):
+        self.backend = backend or backend_from_url()
         self.connection = self.connect_to_db()
-        self.create_main_table()
+        try:
+            self.create_main_table()
+        except BaseException:
+            self.close()  # Hands the connection (and its pool slot) back before giving up.
+            raise
         # Removed creation of scraped_data table as it's no longer needed.
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
     def connect_to_db(self):
         try:
-            conn = mysql.connector.connect(
-                host='localhost',
-                user='root',
-                password=os.getenv("db_pass"),  # Update with your MySQL password
-                database='edumate'
-            )
-            return conn
-        except Error as e:
+            return self.backend.get_connection()
+        except DB_ERRORS as e:
             print(f"Error connecting to database: {e}")
-            return None
+            raise
+
+    def close(self):
+        """Returns the connection to the pool."""
+        if self.connection is not None:
+            self.backend.release(self.connection)
+            self.connection = None
+
+    @contextmanager
+    def transaction(self):
+        """Unit of work: yields a cursor, commits once on success and rolls back on error."""
+        with closing(self.connection.cursor()) as cursor:
+            try:
+                yield cursor
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+
+    def create_table_once(self, table, statements):
+        key = (self.backend.location, table)
+        with _created_tables_lock:
+            if key in _created_tables:
+                return
+        if all(self.execute_query(statement) for statement in statements):
+            with _created_tables_lock:
+                _created_tables.add(key)
+
+    def add_column_once(self, table, column, definition):
+        """Adds a column that tables created by an older version lack."""
+        key = (self.backend.location, f"{table}.{column}")
+        with _created_tables_lock:
+            if key in _created_tables:
+                return
+        with closing(self.connection.cursor()) as cursor:
+            cursor.execute(self.backend.column_exists_query(), (table, column))
+            exists = cursor.fetchall()[0][0] > 0
+        if exists or self.execute_query(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"):
+            with _created_tables_lock:
+                _created_tables.add(key)
 
     def create_main_table(self):
-        query = '''CREATE TABLE IF NOT EXISTS subjects (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    subject_name VARCHAR(255) UNIQUE,
-                    cdp_path TEXT,
-                    pyq_path TEXT,
-                    notes_path TEXT
-                   );'''
-        self.execute_query(query)
-
-    def create_subject_table(self, subject_name):
-        # Create subject-specific table with two columns: topic_name and file_name
-        query = f'''CREATE TABLE IF NOT EXISTS `{subject_name}` (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    topic_name VARCHAR(255) UNIQUE,
-                    file_name TEXT
-                   );'''
-        self.execute_query(query)
+        # subjects -< subject_topic >- topics; one set of tables for every subject.
+        pk = self.backend.primary_key
+        # `version` goes up with every write of a subject's topics, so readers in other processes can spot changes.
+        self.create_table_once("subjects", self.backend.create_table("subjects", [
+            f"id {pk}", "subject_name VARCHAR(255) UNIQUE", "cdp_path TEXT", "pyq_path TEXT", "notes_path TEXT",
+            "version INT NOT NULL DEFAULT 0"]))
+        self.add_column_once("subjects", "version", "INT NOT NULL DEFAULT 0")
+        self.create_table_once("topics", self.backend.create_table("topics", [
+            f"id {pk}", "topic_name VARCHAR(255) UNIQUE"]))
+        self.create_table_once("subject_topic", self.backend.create_table("subject_topic", [
+            "subject_id INT NOT NULL", "topic_id INT NOT NULL", "topic_rank INT", "importance_score DOUBLE",
+            "artifact_path TEXT", "PRIMARY KEY (subject_id, topic_id)",
+            "FOREIGN KEY (subject_id) REFERENCES subjects(id)", "FOREIGN KEY (topic_id) REFERENCES topics(id)",
+        ], indexes=[("idx_subject_topic_topic", ["topic_id"]),
+                    ("idx_subject_topic_rank", ["subject_id", "topic_rank"])]))
+        # Every candidate's PageRank score from the subject's last ranking, kept apart from the study order
+        # (which only holds the kept topics) to warm-start the next ranking.
+        self.create_table_once("topic_scores", self.backend.create_table("topic_scores", [
+            "subject_id INT NOT NULL", "topic_name VARCHAR(255) NOT NULL", "pagerank_score DOUBLE",
+            "PRIMARY KEY (subject_id, topic_name)", "FOREIGN KEY (subject_id) REFERENCES subjects(id)"]))
 
     def subject_exists(self, subject_name):
-        query = "SELECT subject_name FROM subjects WHERE subject_name = %s"
-        cursor = self.connection.cursor()
-        cursor.execute(query, (subject_name,))
-        result = cursor.fetchone()
+        query = f"SELECT subject_name FROM subjects WHERE subject_name = {self.backend.placeholder}"
+        with closing(self.connection.cursor()) as cursor:
+            cursor.execute(query, (subject_name,))
+            result = cursor.fetchone()
         return True if result else False
 
     def fetch_topics(self, subject_name):
-        query = f"SELECT topic_name, file_name FROM `{subject_name}`"
-        cursor = self.connection.cursor()
-        cursor.execute(query)
-        return cursor.fetchall()
+        """Returns (topic_name, artifact_path) rows of a subject in study order."""
+        rows = self.top_topics(subject_name)
+        if not rows and self.migrate_subject_table(subject_name):
+            rows = self.top_topics(subject_name)
+        return [(topic, artifact_path) for topic, artifact_path, _, _ in rows]
+
+    def subject_version(self, subject_name):
+        """Counter bumped by every write of the subject's topics; None for an unknown subject."""
+        query = f"SELECT version FROM subjects WHERE subject_name = {self.backend.placeholder}"
+        with closing(self.connection.cursor()) as cursor:
+            cursor.execute(query, (subject_name,))
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def top_topics(self, subject_name, k=None):
+        """Returns (topic_name, artifact_path, rank, importance_score) of a subject's top-K topics."""
+        p = self.backend.placeholder
+        query = f'''SELECT t.topic_name, st.artifact_path, st.topic_rank, st.importance_score
+                    FROM subjects s
+                    JOIN subject_topic st ON st.subject_id = s.id
+                    JOIN topics t ON t.id = st.topic_id
+                    WHERE s.subject_name = {p}
+                    ORDER BY st.topic_rank IS NULL, st.topic_rank, t.topic_name'''
+        values = (subject_name,)
+        if k is not None:
+            query += f" LIMIT {p}"
+            values += (int(k),)
+        with closing(self.connection.cursor()) as cursor:
+            cursor.execute(query, values)
+            return cursor.fetchall()
+
+    def pagerank_scores(self, subject_name):
+        """Returns {topic_name: PageRank score} of every candidate in the subject's last ranking."""
+        query = f'''SELECT ts.topic_name, ts.pagerank_score
+                    FROM subjects s
+                    JOIN topic_scores ts ON ts.subject_id = s.id
+                    WHERE s.subject_name = {self.backend.placeholder}'''
+        with closing(self.connection.cursor()) as cursor:
+            cursor.execute(query, (subject_name,))
+            return dict(cursor.fetchall())
+
+    def save_pagerank_scores(self, subject_name, scores):
+        """Replaces the subject's stored {topic_name: PageRank score} in one transaction."""
+        if not scores:
+            return
+        p = self.backend.placeholder
+        try:
+            with metrics.span("db_write", table="topic_scores"), self.transaction() as cursor:
+                cursor.execute(self.backend.upsert("subjects", ["subject_name"], ["subject_name"]), (subject_name,))
+                cursor.execute(f"SELECT id FROM subjects WHERE subject_name = {p}", (subject_name,))
+                subject_id = cursor.fetchall()[0][0]
+                cursor.execute(f"DELETE FROM topic_scores WHERE subject_id = {p}", (subject_id,))
+                cursor.executemany(f"INSERT INTO topic_scores (subject_id, topic_name, pagerank_score) VALUES ({p}, {p}, {p})",
+                                   [(subject_id, topic, float(score)) for topic, score in scores.items()])
+            metrics.inc("db_rows_written", len(scores), table="topic_scores")
+        except DB_ERRORS as e:
+            print(f"Database batch error: {e}")
+
+    def subjects_with_topic(self, topic_name):
+        """Returns (subject_name, rank, artifact_path) of every subject that covers a topic."""
+        query = f'''SELECT s.subject_name, st.topic_rank, st.artifact_path
+                    FROM topics t
+                    JOIN subject_topic st ON st.topic_id = t.id
+                    JOIN subjects s ON s.id = st.subject_id
+                    WHERE t.topic_name = {self.backend.placeholder}
+                    ORDER BY s.subject_name'''
+        with closing(self.connection.cursor()) as cursor:
+            cursor.execute(query, (topic_name,))
+            return cursor.fetchall()
 
     def insert_subject(self, subject_name, cdp_path, pyq_path, notes_path):
-        query = '''INSERT INTO subjects (subject_name, cdp_path, pyq_path, notes_path)
-                   VALUES (%s, %s, %s, %s)
-                   ON DUPLICATE KEY UPDATE cdp_path=VALUES(cdp_path), pyq_path=VALUES(pyq_path), notes_path=VALUES(notes_path);'''
-        self.execute_query(query, (subject_name, cdp_path, pyq_path, notes_path))
+        query = self.backend.upsert("subjects", ["subject_name", "cdp_path", "pyq_path", "notes_path"],
+                                    ["cdp_path", "pyq_path", "notes_path"])
+        with metrics.span("db_write", table="subjects"):
+            if self.execute_query(query, (subject_name, cdp_path, pyq_path, notes_path)):
+                notify_write(self.backend.location, subject_name)
 
     def insert_topics(self, subject_name, ranked_topics):
         # This method was used to insert extracted topics.
-        # We are not using it now as scraped topics will be inserted via insert_scraped_topic.
-        self.create_subject_table(subject_name)
-        query = f'''INSERT INTO `{subject_name}` (topic_name, file_name)
-                   VALUES (%s, %s)
-                   ON DUPLICATE KEY UPDATE file_name=VALUES(file_name);'''
-        # ranked_topics is not used here.
-        self.execute_batch_query(query, ranked_topics)
+        # We are not using it now as scraped topics will be inserted via insert_scraped_topics.
+        self.insert_scraped_topics(subject_name, ranked_topics)
 
     def insert_scraped_topic(self, subject_name, topic, pdf_path):
-        # Insert scraped topic (with PDF file) into the subject-specific table.
-        self.create_subject_table(subject_name)
-        query = f'''INSERT INTO `{subject_name}` (topic_name, file_name)
-                   VALUES (%s, %s)
-                   ON DUPLICATE KEY UPDATE file_name=VALUES(file_name);'''
-        self.execute_query(query, (topic, pdf_path))
+        # Insert scraped topic (with PDF file) for the subject.
+        self.insert_scraped_topics(subject_name, [(topic, pdf_path)])
+
+    def insert_scraped_topics(self, subject_name, rows, replace=False):
+        """Writes a subject's topics in one transaction.
+
+        Rows are (topic, artifact_path) with optional rank and importance score
+        appended; a missing rank or score keeps the value already stored. With
+        `replace`, the rows are the subject's whole ranked set and its other
+        topics are removed, so a re-run drops topics that left the top list.
+        """
+        rows = [(tuple(row) + (None, None))[:4] for row in rows]
+        if not rows:
+            return
+        p = self.backend.placeholder
+        try:
+            with metrics.span("db_write", table="subject_topic"), self.transaction() as cursor:
+                cursor.execute(self.backend.upsert("subjects", ["subject_name"], ["subject_name"]), (subject_name,))
+                cursor.executemany(self.backend.upsert("topics", ["topic_name"], ["topic_name"]),
+                                   [(topic,) for topic, _, _, _ in rows])
+                cursor.execute(f"SELECT id FROM subjects WHERE subject_name = {p}", (subject_name,))
+                subject_id = cursor.fetchall()[0][0]
+                topic_names = list({topic for topic, _, _, _ in rows})
+                cursor.execute(f"SELECT topic_name, id FROM topics WHERE topic_name IN ({', '.join([p] * len(topic_names))})",
+                               topic_names)
+                topic_ids = dict(cursor.fetchall())
+                query = self.backend.upsert(
+                    "subject_topic", ["subject_id", "topic_id", "topic_rank", "importance_score", "artifact_path"],
+                    ["topic_rank", "importance_score", "artifact_path"], key=["subject_id", "topic_id"],
+                    coalesce=["topic_rank", "importance_score"])
+                cursor.executemany(query, [(subject_id, topic_ids[topic], rank, score, path)
+                                           for topic, path, rank, score in rows])
+                if replace:
+                    cursor.execute(f"DELETE FROM subject_topic WHERE subject_id = {p} "
+                                   f"AND topic_id NOT IN ({', '.join([p] * len(topic_ids))})",
+                                   [subject_id, *topic_ids.values()])
+                cursor.execute(f"UPDATE subjects SET version = version + 1 WHERE id = {p}", (subject_id,))
+            metrics.inc("db_rows_written", len(rows), table="subject_topic")
+        except DB_ERRORS as e:
+            print(f"Database batch error: {e}")
+            return
+        notify_write(self.backend.location, subject_name)
+
+    # ----------------------- Legacy Per-Subject Tables -----------------------
+    def legacy_table_exists(self, subject_name):
+        if subject_name in ("subjects", "topics", "subject_topic"):
+            return False
+        with closing(self.connection.cursor()) as cursor:
+            cursor.execute(self.backend.table_exists_query(), (subject_name,))
+            return cursor.fetchall()[0][0] > 0
+
+    def migrate_subject_table(self, subject_name, drop=False):
+        """Copies an old one-table-per-subject table into the unified schema; returns rows moved.
+
+        The old tables were filled alphabetically, so their order is no ranking and
+        the topics are stored without one.
+        """
+        if not self.legacy_table_exists(subject_name):
+            return 0
+        with closing(self.connection.cursor()) as cursor:
+            cursor.execute(f"SELECT topic_name, file_name FROM `{subject_name}` ORDER BY id")
+            rows = cursor.fetchall()
+        self.insert_scraped_topics(subject_name, [(topic, path) for topic, path in rows])
+        if drop:
+            self.execute_query(f"DROP TABLE `{subject_name}`")
+        print(f"Migrated {len(rows)} topics of '{subject_name}' to the unified schema.")
+        return len(rows)
+
+    def migrate_subject_tables(self, drop=False):
+        """Migrates every subject that still has its own table."""
+        with closing(self.connection.cursor()) as cursor:
+            cursor.execute("SELECT subject_name FROM subjects")
+            subjects = [row[0] for row in cursor.fetchall()]
+        return {subject: self.migrate_subject_table(subject, drop) for subject in subjects}
 
     def execute_query(self, query, values=None):
         try:
-            cursor = self.connection.cursor()
-            if values:
-                cursor.execute(query, values)
-            else:
-                cursor.execute(query)
-            self.connection.commit()
-        except Error as e:
+            with self.transaction() as cursor:
+                if values:
+                    cursor.execute(query, values)
+                else:
+                    cursor.execute(query)
+            return True
+        except DB_ERRORS as e:
             print(f"Database error: {e}")
+            return False
 
     def execute_batch_query(self, query, values):
         try:
-            cursor = self.connection.cursor()
-            cursor.executemany(query, values)
-            self.connection.commit()
-        except Error as e:
+            with self.transaction() as cursor:
+                cursor.executemany(query, values)
+        except DB_ERRORS as e:
             print(f"Database batch error: {e}")
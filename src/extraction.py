@@ -1,21 +1,20 @@
-import tkinter as tk
-from tkinter import filedialog
 from collections import defaultdict, Counter
-import fitz
 import re
-import networkx as nx
-import matplotlib.pyplot as plt
-import numpy as np
-import seaborn as sns
-from sklearn.feature_extraction.text import TfidfVectorizer
-import json
-import scraping
 import os
+import metrics
+from corpus_index import tfidf_scores
 from db_handler import DatabaseHandler
+from matcher import TopicMatcher
+from prefilter import prefilter_topics
+
+# GUI, plotting, PyMuPDF and the pipeline are imported where they are
+# first used, so looking up a stored subject does not load them.
 
 # ----------------------- File Upload GUI -----------------------
 class FileUploadApp:
     def __init__(self, root):
+        import tkinter as tk
+
         self.root = root
         root.title("File Upload - Study Material")
         root.geometry("450x350")  # Set window size
@@ -48,6 +47,8 @@ class FileUploadApp:
         self.submit_btn.pack(pady=10)
 
     def upload_file(self, file_type):
+        from tkinter import filedialog
+
         file_path = filedialog.askopenfilename(filetypes=[("PDF files", "*.pdf")])
         if file_path:
             self.file_paths[file_type] = file_path
@@ -60,19 +61,21 @@ class FileUploadApp:
             print("Please enter a subject name!")
             return
 
-        db = DatabaseHandler()
+        with DatabaseHandler() as db:
+            self.process_subject(db, subject_name)
+
+    def process_subject(self, db, subject_name):
+        import pipeline
+
         if db.subject_exists(subject_name):
             print(f"Subject '{subject_name}' already exists in the database. Fetching existing data...\n")
-            topics = db.fetch_topics(subject_name)
-            if topics:
-                print(f"Topics for subject '{subject_name}':")
-                for topic, file_name in topics:
-                    print(f" - {topic}: {file_name}")
+            if db.fetch_topics(subject_name):
+                print(f"Study order for subject '{subject_name}':")
+                for topic, file_name, rank, importance in db.top_topics(subject_name):
+                    score = f" (importance {importance:.2f})" if importance is not None else ""
+                    print(f" {rank or '-'}. {topic}{score}: {file_name}")
             else:
                 print("No topics found for this subject yet.")
-            # Write subject name to a temporary file for scraping module and close the GUI
-            with open("subject.txt", "w") as f:
-                f.write(subject_name)
             self.root.destroy()
             return
 
@@ -90,16 +93,11 @@ class FileUploadApp:
         # Insert the new subject data into the database
         db.insert_subject(subject_name, cdp_pdf_path, pyq_pdf_path, notes_pdf_path)
 
-        # Process the PDFs
-        cdp_topics = extract_topics_from_pdf(cdp_pdf_path)
-        pyq_topics = extract_topics_from_pdf(pyq_pdf_path)
-        notes_text = extract_text_from_pdf(notes_pdf_path)
-
-        # Create Adjacency List and Topic Importance
-        adjacency_list, importance_score = create_adjacency_list(cdp_topics, notes_text, pyq_topics)
-
-        # Apply PageRank for final topic order
-        ranked_topics = rank_topics_with_pagerank(adjacency_list)
+        # Extract, rank, clean, scrape, render and store as one streaming pipeline;
+        # the top topics are saved while lower-ranked candidates are still being cleaned.
+        result = pipeline.run_pipeline(subject_name, cdp_pdf_path, pyq_pdf_path, notes_pdf_path, db=db)
+        ranked_topics, importance_score = result.ranked_topics, result.importance_score
+        adjacency_list = result.adjacency_list
 
         # Print Results
         print("\n*Final Study Order (Based on PageRank)*")
@@ -114,43 +112,73 @@ class FileUploadApp:
         for topic, related in adjacency_list.items():
             print(f"{topic}: {related}")
 
-        # Save study order to JSON
-        save_study_order_to_json(ranked_topics)
-
-        # NOTE: We no longer insert extracted topics here.
-        # Instead, scraping.py will process the top 10 topics and store scraped PDFs.
-
-        # Write the subject name to a temporary file for scraping.py
-        with open("subject.txt", "w") as f:
-            f.write(subject_name)
+        print("\n*Saved Topics*")
+        for artifact in result.artifacts:
+            print(f"{artifact.topic.rank}. {artifact.topic.topic}: {artifact.pdf_path}")
+        print(result.stats.summary())
+        print(result.store.report())
 
         # Visualizations
-        visualize_graph(adjacency_list)
-        visualize_topic_importance(importance_score)
-
-        scraping.scrap()
+        if result.topic_graph is not None:
+            visualize_graph(result.topic_graph)
+            visualize_topic_importance(importance_score)
 
 # ----------------------- PDF Processing -----------------------
 def extract_text_from_pdf(pdf_path):
     """Extracts text from a given PDF file."""
-    doc = fitz.open(pdf_path)
-    full_text = " ".join(page.get_text("text") for page in doc)
+    from pdf_text import iter_pages
+
+    with metrics.span("pdf_parse"):
+        full_text = " ".join(iter_pages(pdf_path))
     return full_text.lower()
 
-def extract_topics_from_pdf(pdf_path):
-    """Extracts topics from CDP or PYQ PDF."""
+def extract_topics_from_pdf(pdf_path, prefilter=True):
+    """Extracts topics from CDP or PYQ PDF, dropping obvious non-topics unless prefilter=False."""
+    if prefilter:
+        return extract_topics_with_report(pdf_path)[0]
     text = extract_text_from_pdf(pdf_path)
     topics = re.split(r"[,.()\n]", text)
     cleaned_topics = [topic.strip().lower() for topic in topics if topic.strip()]
     return list(set(cleaned_topics))  # Remove duplicates
 
+def extract_topics_with_report(pdf_path):
+    """Extracts and pre-filters topics, returning (topics, PrefilterReport)."""
+    from pdf_text import iter_pages
+
+    with metrics.span("pdf_parse"):
+        pages = list(iter_pages(pdf_path))
+    topics = re.split(r"[,.()\n]", " ".join(pages).lower())
+    cleaned_topics = list({topic.strip() for topic in topics if topic.strip()})
+    with metrics.span("prefilter"):
+        kept_topics, report = prefilter_topics(cleaned_topics, pages)
+    metrics.inc("topics", len(cleaned_topics), step="extracted")
+    metrics.inc("topics", len(cleaned_topics) - len(kept_topics), step="prefiltered_out")
+    print(f"{os.path.basename(pdf_path)}: {report}")
+    return kept_topics, report
+
+def report_prefilter_savings(report, ranking_seconds):
+    """Reports what the CDP pre-filter removed next to the measured ranking time.
+
+    Only the filtered path runs here; benchmark.bench_prefilter times both.
+    """
+    removed = report.total - report.kept
+    if not removed:
+        return
+    print(f"Pre-filter removed {removed} of {report.total} CDP candidates before ranking "
+          f"({ranking_seconds:.2f}s for the {report.kept} kept), so {removed} fewer titles go to the LLM.")
+
 # ----------------------- TF-IDF Calculation -----------------------
-def calculate_tfidf(notes_text, topics):
-    """Calculates TF-IDF scores for topics in the notes."""
-    vectorizer = TfidfVectorizer(vocabulary=topics)
-    tfidf_matrix = vectorizer.fit_transform([notes_text])
-    scores = dict(zip(vectorizer.get_feature_names_out(), tfidf_matrix.toarray()[0]))
-    return scores
+def calculate_tfidf(topic_counts, index=None, subject_name=None):
+    """Calculates TF-IDF scores from the topics' mention counts in the notes.
+
+    Given a CorpusIndex and the subject name, the counts replace the subject's row
+    in the index and IDF comes from every subject's notes; otherwise the notes are
+    a corpus of one document.
+    """
+    if index is None or subject_name is None:
+        return tfidf_scores(topic_counts)
+    index.add_subject(subject_name, topic_counts)
+    return index.tfidf(subject_name, list(topic_counts))
 
 # ----------------------- Topic Matching -----------------------
 def match_topics(cdp_topics, pyq_topics):
@@ -162,17 +190,27 @@ def match_topics(cdp_topics, pyq_topics):
     return topic_weight
 
 # ----------------------- Adjacency List & Ranking -----------------------
-def create_adjacency_list(cdp_topics, notes_text, pyq_topics):
-    """Creates topic dependencies & calculates importance scores."""
+def create_adjacency_list(cdp_topics, notes_text, pyq_topics, index=None, subject_name=None):
+    """Creates topic dependencies & calculates importance scores.
+
+    Pass a CorpusIndex and the subject name to score TF-IDF against every subject's notes.
+    """
+    with metrics.span("adjacency"):
+        return _create_adjacency_list(cdp_topics, notes_text, pyq_topics, index, subject_name)
+
+def _create_adjacency_list(cdp_topics, notes_text, pyq_topics, index, subject_name):
     adjacency_list = defaultdict(list)
     topic_mention_count = Counter()
 
     pyq_weights = match_topics(cdp_topics, pyq_topics)
-    tfidf_scores = calculate_tfidf(notes_text, cdp_topics)
+
+    # One pass over the notes finds every topic; counts and presence feed all three outputs.
+    matches = TopicMatcher(cdp_topics).match(notes_text)
+    found_topics = [topic for topic in cdp_topics if topic in matches.present]
+    tfidf_scores = calculate_tfidf({topic: matches.count(topic) for topic in cdp_topics}, index, subject_name)
 
     for topic in cdp_topics:
-        topic_pattern = r"\b" + re.escape(topic) + r"\b"
-        count = len(re.findall(topic_pattern, notes_text))
+        count = matches.count(topic)
 
         topic_mention_count[topic] = (
                 count * 1.5 +
@@ -180,40 +218,54 @@ def create_adjacency_list(cdp_topics, notes_text, pyq_topics):
                 tfidf_scores.get(topic, 0) * 5
         )
 
-        for other_topic in cdp_topics:
-            if topic != other_topic and re.search(r"\b" + re.escape(other_topic) + r"\b", notes_text):
+        for other_topic in found_topics:
+            if topic != other_topic:
                 adjacency_list[topic].append(other_topic)
 
     return dict(adjacency_list), topic_mention_count
 
 # ----------------------- PageRank for Study Order -----------------------
-def rank_topics_with_pagerank(adjacency_list):
-    """Applies PageRank to determine topic importance."""
-    G = nx.DiGraph()
+def rank_topics_with_pagerank(adjacency_list, previous_scores=None):
+    """Applies PageRank to determine topic importance.
+
+    Pass the {topic: score} of an earlier ranking as `previous_scores` to warm-start
+    the power iteration after the notes or PYQs of a subject change.
+    """
+    graph = as_topic_graph(adjacency_list)
+    with metrics.span("pagerank"):
+        page_rank_scores = graph.pagerank(alpha=0.85, start=previous_scores)
+    metrics.inc("topics", len(page_rank_scores), step="ranked")
+    return sorted(page_rank_scores.items(), key=lambda x: x[1], reverse=True)
 
-    for topic, related_topics in adjacency_list.items():
-        for related_topic in related_topics:
-            G.add_edge(topic, related_topic)
+def as_topic_graph(adjacency_list):
+    """Returns a TopicGraph, building it from an adjacency dict when needed."""
+    from topic_graph import TopicGraph
 
-    page_rank_scores = nx.pagerank(G, alpha=0.85)
-    return sorted(page_rank_scores.items(), key=lambda x: x[1], reverse=True)
+    if isinstance(adjacency_list, TopicGraph):
+        return adjacency_list
+    return TopicGraph.from_adjacency_list(adjacency_list)
 
 # ----------------------- Visualization -----------------------
-def visualize_graph(adjacency_list):
-    """Visualizes the topic dependency graph."""
-    G = nx.DiGraph()
-    for topic, related_topics in adjacency_list.items():
-        for related_topic in related_topics:
-            G.add_edge(topic, related_topic)
+def visualize_graph(adjacency_list, output_path=None):
+    """Visualizes the topic dependency graph, saving it to `output_path` when one is given."""
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
+    graph = as_topic_graph(adjacency_list)
+    G = nx.from_scipy_sparse_array(graph.matrix, create_using=nx.DiGraph)
+    G = nx.relabel_nodes(G, dict(enumerate(graph.topics)))
 
     plt.figure(figsize=(12, 8))
     pos = nx.spring_layout(G, seed=42)
     nx.draw(G, pos, with_labels=True, node_size=2000, node_color="lightblue", edge_color="gray", font_size=10)
     plt.title("Topic Dependency Graph")
-    plt.show()
+    show_or_save(output_path)
+
+def visualize_topic_importance(importance_score, output_path=None):
+    """Plots the top 10 most important topics, saving the plot to `output_path` when one is given."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
-def visualize_topic_importance(importance_score):
-    """Plots the top 10 most important topics."""
     sorted_topics = sorted(importance_score.items(), key=lambda x: x[1], reverse=True)[:10]
     topics, counts = zip(*sorted_topics) if sorted_topics else ([], [])
 
@@ -223,17 +275,20 @@ def visualize_topic_importance(importance_score):
     plt.ylabel("Topics")
     plt.title("Top 10 Most Important Topics")
     plt.grid(axis='x', linestyle='--', alpha=0.7)
-    plt.show()
+    show_or_save(output_path)
 
-def save_study_order_to_json(ranked_topics):
-    """Saves the final study order to a JSON file with a proper structure."""
-    study_order = {
-        "study_order": [{"topic": topic, "score": score} for topic, score in ranked_topics]
-    }
-    with open("study_order.json", "w") as json_file:
-        json.dump(study_order, json_file, indent=4)
+def show_or_save(output_path=None):
+    import matplotlib.pyplot as plt
+
+    if output_path:
+        plt.savefig(output_path, bbox_inches="tight")
+        plt.close()
+    else:
+        plt.show()
 
 def extract():
+    import tkinter as tk
+
     root = tk.Tk()
     app = FileUploadApp(root)
     root.mainloop()
@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+
+# ----------------------- Rate Limiting -----------------------
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# ----------------------- Pooled Session -----------------------
+class PooledFetcher:
+    """Shared requests.Session with per-host token buckets and bounded retry/backoff.
+
+    Safe to call from many threads at once; `pool_size` should be at least the
+    number of worker threads so connections are reused instead of reopened.
+    """
+
+    def __init__(self, rate=5.0, burst=None, max_retries=3, backoff=0.5, max_backoff=8.0,
+                 pool_size=16, timeout=10, headers=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(headers or {})
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+
+    def bucket(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def get(self, url, attempts=None, **kwargs):
+        """GETs a URL, retrying connection errors and 429/5xx responses with jittered backoff.
+
+        When `attempts` is a list, each attempt's response or connection error is appended to it.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlparse(url).netloc
+        for attempt in range(self.max_retries + 1):
+            self.bucket(url).acquire()
+            with self.lock:
+                self.requests += 1
+            try:
+                with metrics.span("http_request", host=host):
+                    response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.inc("http_responses", host=host, status=type(e).__name__)
+                if attempts is not None:
+                    attempts.append(e)
+                if attempt == self.max_retries:
+                    raise
+            else:
+                metrics.inc("http_responses", host=host, status=response.status_code)
+                if attempts is not None:
+                    attempts.append(response)
+                if response.status_code not in TRANSIENT_STATUSES or attempt == self.max_retries:
+                    return response
+            with self.lock:
+                self.retries += 1
+            metrics.inc("http_retries", host=host)
+            time.sleep(min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,240 @@
+import json
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Local stand-ins for the external services EduMate talks to, used by benchmark.py
+# so the pipeline can be exercised without network access or API keys.
+
+
+class LocalService:
+    """Runs a request handler on 127.0.0.1 in a background thread; use as a context manager."""
+
+    handler_class = None
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        service = self
+
+        class Handler(self.handler_class):
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 128  # Concurrent clients would otherwise wait out SYN retransmits.
+
+        Handler.service = service
+        self.server = Server(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, payload):
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += len(payload)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def send_body(self, body, content_type="application/json", status=200, headers=None):
+        payload = body.encode("utf-8") if isinstance(body, str) else body
+        if self.service.latency:
+            time.sleep(self.service.latency)
+        self.service.count(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+
+# ----------------------- Ollama -----------------------
+NOISE_WORDS = {"unit", "faculty", "course", "syllabus", "examples", "introduction", "and", "of", "as", "in", "with"}
+
+
+def looks_like_concept(title):
+    """Deterministic stand-in for the LLM's yes/no judgement."""
+    words = re.findall(r"[a-z]+", title.lower())
+    return len(words) >= 1 and len(" ".join(words)) > 3 and words[0] not in NOISE_WORDS and words[-1] not in NOISE_WORDS
+
+
+class FakeOllamaHandler(ServiceHandler):
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_body(json.dumps({"error": "not found"}), status=404)
+            return
+        request = self.read_json()
+        prompt = request.get("prompt", "")
+        if "Titles:" in prompt:
+            listing = prompt.split("Titles:", 1)[1]
+            titles = re.findall(r"^(\d+)\. (.*)$", listing, re.MULTILINE)
+            answer = json.dumps({number: "yes" if looks_like_concept(title) else "no" for number, title in titles})
+        else:
+            title = prompt.rsplit("Title:", 1)[-1].split("\n", 1)[0]
+            answer = "yes" if looks_like_concept(title) else "no"
+        body = {"model": request.get("model", ""), "created_at": "2024-01-01T00:00:00Z",
+                "response": answer, "done": True, "done_reason": "stop"}
+        # Ollama streams NDJSON; a single final chunk is a valid stream.
+        self.send_body(json.dumps(body) + "\n", content_type="application/x-ndjson")
+
+
+class FakeOllama(LocalService):
+    """Answers /api/generate for both the single-title and batched cleaning prompts."""
+
+    handler_class = FakeOllamaHandler
+
+
+# ----------------------- Wikipedia -----------------------
+def canned_article(title, paragraphs=12):
+    """Deterministic article paragraphs about `title` with citation markers like the real pages."""
+    return [f"{title} is a fundamental idea in the study of algorithms [{2 * i + 1}]. "
+            f"Many textbooks describe {title} together with its running time and correctness proofs in chapter {i}. "
+            f"In practice {title} is applied to graphs, strings and numeric problems alike [{2 * i + 2}]. "
+            f"Variants of {title} trade memory for speed depending on the input size."
+            for i in range(paragraphs)]
+
+
+class FakeWikipediaHandler(ServiceHandler):
+    def do_GET(self):
+        service = self.service
+        with service.lock:
+            service.page_views += 1
+            flaky = service.flaky_every and service.page_views % service.flaky_every == 0
+        if flaky:
+            self.send_body("busy", content_type="text/plain", status=503)
+            return
+        if self.path.startswith("/w/api.php"):
+            self.send_body(json.dumps(self.query_extracts(parse_qs(urlparse(self.path).query))))
+            return
+        if not self.path.startswith("/wiki/"):
+            self.send_body("not found", content_type="text/plain", status=404)
+            return
+        title = unquote(self.path[len("/wiki/"):]).replace("_", " ")
+        if title.lower().startswith("missing"):
+            self.send_body("<html><body>No such page</body></html>", content_type="text/html", status=404)
+            return
+        paragraphs = "".join(f"<p>{paragraph}</p>" for paragraph in canned_article(title, service.paragraphs))
+        html = (f"<html><head><title>{title}</title></head><body><div id=\"mw-navigation\"><p>Menu</p></div>"
+                f"<div id=\"mw-content-text\">{paragraphs}</div></body></html>")
+        self.send_body(html, content_type="text/html; charset=utf-8")
+
+    def query_extracts(self, params):
+        # Mirrors action=query&prop=extracts&explaintext&redirects&formatversion=2. Like TextExtracts, a
+        # response carries one whole-article extract, or up to 20 intro extracts with exintro; `excontinue`
+        # counts the pages that exist.
+        titles = params.get("titles", [""])[0].split("|")
+        offset = int(params.get("excontinue", ["0"])[0])
+        intro = "exintro" in params
+        limit = 20 if intro else 1
+        if len(titles) > 50:
+            return {"error": {"code": "toomanyvalues", "info": "Too many values supplied for parameter \"titles\"."}}
+        normalized, redirects, pages, found = [], [], [], 0
+        for i, title in enumerate(titles):
+            page_title = title.replace("_", " ")
+            page_title = page_title[:1].upper() + page_title[1:]
+            if page_title != title:
+                normalized.append({"fromencoded": False, "from": title, "to": page_title})
+            if page_title.lower().startswith("redirect to "):
+                target = page_title[len("redirect to "):]
+                target = target[:1].upper() + target[1:]
+                redirects.append({"from": page_title, "to": target})
+                page_title = target
+            if page_title.lower().startswith("missing"):
+                pages.append({"ns": 0, "title": page_title, "missing": True})
+                continue
+            page = {"pageid": 1000 + i, "ns": 0, "title": page_title}
+            if offset <= found < offset + limit:
+                paragraphs = [re.sub(r" ?\[\d+\]", "", paragraph)
+                              for paragraph in canned_article(page_title, self.service.paragraphs)]
+                paragraphs = paragraphs[:1] if intro else paragraphs
+                page["extract"] = "\n".join(f"{paragraph}\n\n== Section {k} ==" for k, paragraph in enumerate(paragraphs))
+            found += 1
+            pages.append(page)
+        data = {"batchcomplete": True, "query": {"normalized": normalized, "redirects": redirects, "pages": pages}}
+        if found > offset + limit:
+            data = {"continue": {"excontinue": str(offset + limit), "continue": "||"}, **data}
+            del data["batchcomplete"]
+        return data
+
+
+class FakeWikipedia(LocalService):
+    """Serves canned /wiki/<Title> pages and /w/api.php extracts; titles starting with
+    'missing' don't exist and 'redirect to X' redirects to X.
+
+    `flaky_every=n` answers every n-th request with a 503 to exercise retries.
+    """
+
+    handler_class = FakeWikipediaHandler
+
+    def __init__(self, latency=0.0, paragraphs=12, flaky_every=0):
+        super().__init__(latency)
+        self.paragraphs = paragraphs
+        self.flaky_every = flaky_every
+        self.page_views = 0
+
+
+# ----------------------- YouTube -----------------------
+class FakeYouTubeHandler(ServiceHandler):
+    def do_GET(self):
+        service = self.service
+        if not self.path.startswith("/youtube/v3/search"):
+            self.send_body(json.dumps({"error": {"code": 404, "message": "Not Found"}}), status=404)
+            return
+        params = parse_qs(urlparse(self.path).query)
+        if not params.get("key"):
+            self.send_body(json.dumps({"error": {"code": 403, "message": "The request is missing a valid API key.",
+                                                 "errors": [{"reason": "forbidden"}]}}), status=403)
+            return
+        with service.lock:
+            exhausted = service.quota is not None and service.units + 100 > service.quota
+            if not exhausted:
+                service.units += 100
+        if exhausted:
+            self.send_body(json.dumps({"error": {"code": 403, "message": "The request cannot be completed because "
+                                                 "you have exceeded your quota.",
+                                                 "errors": [{"domain": "youtube.quota", "reason": "quotaExceeded"}]}}),
+                           status=403)
+            return
+        query = params.get("q", [""])[0]
+        count = int(params.get("maxResults", ["5"])[0])
+        items = [{"kind": "youtube#searchResult", "id": {"kind": "youtube#video", "videoId": f"vid{zlib.crc32(f'{query}|{i}'.encode()):08x}"},
+                  "snippet": {"title": f"{query} explained, part {i + 1}", "channelTitle": "EduMate Test"}}
+                 for i in range(count)]
+        self.send_body(json.dumps({"kind": "youtube#searchListResponse", "items": items}))
+
+
+class FakeYouTube(LocalService):
+    """Serves /youtube/v3/search; each search costs 100 units, and past `quota` units
+    requests fail with 403 quotaExceeded like the real Data API."""
+
+    handler_class = FakeYouTubeHandler
+
+    def __init__(self, latency=0.0, quota=None):
+        super().__init__(latency)
+        self.quota = quota
+        self.units = 0
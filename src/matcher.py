@@ -0,0 +1,122 @@
+from collections import defaultdict, deque
+
+
+def _is_word_char(c):
+    # Same definition of \w that `re` uses for str patterns.
+    return c.isalnum() or c == "_"
+
+
+# ----------------------- Aho-Corasick Topic Index -----------------------
+class TopicMatcher:
+    """Finds every topic of a topic set in a single pass over a text.
+
+    Matches follow the same rules as `re.findall(r"\\b" + re.escape(topic) + r"\\b", text)`,
+    so counts and positions line up with the per-topic regex scans this replaces.
+    """
+
+    def __init__(self, topics):
+        self.topics = list(dict.fromkeys(topic for topic in topics if topic))
+        self._lengths = [len(topic) for topic in self.topics]
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for topic_id, topic in enumerate(self.topics):
+            state = 0
+            for ch in topic:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(topic_id)
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+    def match(self, text):
+        """Scans the text once and returns a TopicMatches with every bounded occurrence."""
+        goto, fail, out, lengths = self._goto, self._fail, self._out, self._lengths
+        n = len(text)
+        positions = defaultdict(list)
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = i + 1
+            after = _is_word_char(text[end]) if end < n else False
+            for topic_id in out[state]:
+                start = end - lengths[topic_id]
+                before = _is_word_char(text[start - 1]) if start > 0 else False
+                if before != _is_word_char(text[start]) and _is_word_char(ch) != after:
+                    positions[topic_id].append(start)
+        return TopicMatches(self.topics, self._lengths, positions)
+
+
+class TopicMatches:
+    """Result of one TopicMatcher scan: positions, mention counts and co-occurrence."""
+
+    def __init__(self, topics, lengths, positions):
+        self.positions = {topics[topic_id]: starts for topic_id, starts in positions.items()}
+        self.counts = {
+            topics[topic_id]: _count_non_overlapping(starts, lengths[topic_id])
+            for topic_id, starts in positions.items()
+        }
+        self.present = set(self.positions)
+        self._topics = topics
+
+    def count(self, topic):
+        """Non-overlapping mention count, identical to len(re.findall(...))."""
+        return self.counts.get(topic, 0)
+
+    def cooccurrence(self, window=None):
+        """Maps each present topic to the other topics found near it.
+
+        With window=None the whole text is one context, so every present topic
+        co-occurs with every other present one. Otherwise two topics co-occur
+        when their start positions are at most `window` characters apart.
+        """
+        if window is None:
+            found = [topic for topic in self._topics if topic in self.present]
+            related = {topic: [other for other in found if other != topic] for topic in found}
+            return {topic: others for topic, others in related.items() if others}
+
+        events = sorted((start, topic) for topic, starts in self.positions.items() for start in starts)
+        related = defaultdict(set)
+        lo = 0
+        for j, (start, topic) in enumerate(events):
+            while events[lo][0] < start - window:
+                lo += 1
+            for k in range(lo, j):
+                other = events[k][1]
+                if other != topic:
+                    related[topic].add(other)
+                    related[other].add(topic)
+        order = {topic: i for i, topic in enumerate(self._topics)}
+        return {topic: sorted(others, key=order.get) for topic, others in related.items()}
+
+
+def _count_non_overlapping(starts, length):
+    # re.findall resumes scanning at the end of the previous match.
+    count, next_free = 0, 0
+    for start in starts:
+        if start >= next_free:
+            count += 1
+            next_free = start + length
+    return count
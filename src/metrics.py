@@ -0,0 +1,220 @@
+import bisect
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_DIR = "metrics"
+PROFILE_DIR = "profiles"
+PROMETHEUS_PREFIX = "edumate_"
+# Seconds; covers a cached lookup up to a slow LLM batch or a long PDF.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def series_name(name, key):
+    if not key:
+        return name
+    return name + "{" + ",".join(f'{label}="{value}"' for label, value in key) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf.
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (the max for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {"count": self.count, "sum": self.sum, "max": self.max,
+                "mean": self.sum / self.count if self.count else 0.0, "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99),
+                "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts))}
+
+
+# ----------------------- Registry -----------------------
+class Metrics:
+    """Counters, latency histograms and timed spans shared by every thread of the process.
+
+    Recording is a dict update under one lock, cheap enough to leave on; set
+    EDUMATE_METRICS=0 to turn it off. Spans named in EDUMATE_PROFILE (comma
+    separated) or passed to profile() also run under cProfile, and the stats
+    accumulated for that span are dumped to `PROFILE_DIR/<name>.prof`.
+    """
+
+    def __init__(self, enabled=None, profile=None):
+        self.enabled = os.getenv("EDUMATE_METRICS", "1") != "0" if enabled is None else enabled
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.profiled = {}
+        self.profile_lock = threading.Lock()  # cProfile can only trace one span at a time.
+        for name in (profile if profile is not None else os.getenv("EDUMATE_PROFILE", "")).split(","):
+            if name.strip():
+                self.profile(name.strip())
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Times the block into the `span_seconds{span=name}` histogram; failures also count as span_errors."""
+        if not self.enabled:
+            yield
+            return
+        profiler = self.profiled.get(name, (None, None))[0]
+        if profiler is not None and not self.profile_lock.acquire(blocking=False):
+            profiler = None
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        except BaseException:
+            self.inc("span_errors", span=name, **labels)
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            self.observe("span_seconds", time.perf_counter() - start, span=name, **labels)
+            if profiler is not None:
+                try:
+                    self.dump_profile(name)
+                finally:
+                    self.profile_lock.release()
+
+    # ----------------------- Profiling -----------------------
+    def profile(self, name, path=None):
+        """Runs every `name` span under cProfile and writes the accumulated stats to `path`."""
+        path = path or os.path.join(PROFILE_DIR, f"{name}.prof")
+        self.profiled[name] = (cProfile.Profile(), path)
+        return path
+
+    def dump_profile(self, name):
+        profiler, path = self.profiled[name]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        profiler.dump_stats(path)
+
+    # ----------------------- Export -----------------------
+    def snapshot(self):
+        """Every series as plain data: {"counters": {series: value}, "histograms": {series: {...}}}."""
+        with self.lock:
+            return {"counters": {series_name(name, escape_labels(key)): value
+                                 for (name, key), value in sorted(self.counters.items())},
+                    "histograms": {series_name(name, escape_labels(key)): histogram.as_dict()
+                                   for (name, key), histogram in sorted(self.histograms.items())}}
+
+    def to_prometheus(self):
+        """The registry in the Prometheus text exposition format."""
+        lines, typed = [], set()
+        with self.lock:
+            for (name, key), value in sorted(self.counters.items()):
+                metric = f"{PROMETHEUS_PREFIX}{name}_total"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{series_name(metric, escape_labels(key))} {value}")
+            for (name, key), histogram in sorted(self.histograms.items()):
+                metric = f"{PROMETHEUS_PREFIX}{name}"
+                if metric not in typed:
+                    typed.add(metric)
+                    lines.append(f"# TYPE {metric} histogram")
+                key, cumulative = escape_labels(key), 0
+                for bound, count in zip([*map(str, histogram.buckets), "+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{series_name(metric + '_bucket', key + (('le', bound),))} {cumulative}")
+                lines.append(f"{series_name(metric + '_sum', key)} {histogram.sum}")
+                lines.append(f"{series_name(metric + '_count', key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Writes the text format atomically, e.g. for node_exporter's textfile collector."""
+        write_atomic(path, self.to_prometheus())
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+def escape_labels(key):
+    return tuple((name, re.sub(r'(["\\])', r"\\\1", value).replace("\n", r"\n")) for name, value in key)
+
+
+def delta(after, before):
+    """What was recorded between two snapshots; series that did not change are left out."""
+    counters = {series: value - before["counters"].get(series, 0) for series, value in after["counters"].items()
+                if value != before["counters"].get(series, 0)}
+    histograms = {}
+    for series, histogram in after["histograms"].items():
+        earlier = before["histograms"].get(series)
+        if earlier is None:
+            histograms[series] = histogram
+        elif histogram["count"] != earlier["count"]:
+            # Quantiles and max cannot be subtracted; recompute what can be from the bucket counts.
+            count = histogram["count"] - earlier["count"]
+            total = histogram["sum"] - earlier["sum"]
+            histograms[series] = {"count": count, "sum": total, "mean": total / count,
+                                  "buckets": {bound: histogram["buckets"][bound] - earlier["buckets"].get(bound, 0)
+                                              for bound in histogram["buckets"]}}
+    return {"counters": counters, "histograms": histograms}
+
+
+def write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_json(path, data):
+    write_atomic(path, json.dumps(data, indent=4))
+
+
+# ----------------------- Process Registry -----------------------
+REGISTRY = Metrics()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+span = REGISTRY.span
+profile = REGISTRY.profile
+snapshot = REGISTRY.snapshot
+to_prometheus = REGISTRY.to_prometheus
+write_prometheus = REGISTRY.write_prometheus
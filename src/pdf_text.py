@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+
+import fitz
+
+import metrics
+from render import shared_pool
+
+PDF_CACHE_DIR = "pdf_cache"
+PAGES_PER_TASK = 8
+# Smaller documents are decoded in-process; a pool only pays off for long notes.
+PARALLEL_MIN_PAGES = 32
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ----------------------- Page Extraction -----------------------
+def extract_page_range(pdf_path, start, stop):
+    """Decodes pages [start, stop) of a PDF; runs inside pool workers."""
+    with fitz.open(pdf_path) as doc:
+        return [doc[i].get_text("text") for i in range(start, stop)]
+
+
+def decode_pages(pdf_path, max_workers=None):
+    """Yields page texts in order, decoding page ranges on the shared process pool.
+
+    At most 2 * max_workers ranges are in flight, so memory stays bounded by the
+    window rather than by the document size. Documents decoded from several
+    threads share the pool's workers instead of each starting their own.
+    """
+    with fitz.open(pdf_path) as doc:
+        page_count = len(doc)
+    max_workers = max_workers or os.cpu_count() or 1
+    if page_count < PARALLEL_MIN_PAGES or max_workers <= 1:
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                yield page.get_text("text")
+        return
+
+    executor = shared_pool()
+    in_flight = deque()
+    try:
+        for start in range(0, page_count, PAGES_PER_TASK):
+            in_flight.append(executor.submit(extract_page_range, pdf_path, start, min(start + PAGES_PER_TASK, page_count)))
+            if len(in_flight) >= 2 * max_workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+    finally:
+        for future in in_flight:
+            future.cancel()  # The reader stopped early; drop ranges nobody will read.
+
+
+def iter_pages(pdf_path, max_workers=None, cache_dir=PDF_CACHE_DIR):
+    """Streams a PDF's page texts, from the content-hash cache when the file was seen before.
+
+    Pages are cached as JSON lines under `cache_dir/<sha256>.jsonl`; the cache
+    file only appears once every page has been decoded.
+    """
+    cache_path = os.path.join(cache_dir, f"{file_digest(pdf_path)}.jsonl")
+    if os.path.exists(cache_path):
+        metrics.inc("cache_lookups", cache="pdf_pages", result="hit")
+        with open(cache_path, "r", encoding="utf-8") as f:
+            for line in f:
+                metrics.inc("pdf_pages", source="cache")
+                yield json.loads(line)
+        return
+    metrics.inc("cache_lookups", cache="pdf_pages", result="miss")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    complete = False
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for text in decode_pages(pdf_path, max_workers):
+                f.write(json.dumps(text) + "\n")
+                metrics.inc("pdf_pages", source="decoded")
+                yield text
+        complete = True
+    finally:
+        if complete:
+            os.replace(tmp_path, cache_path)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
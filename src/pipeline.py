@@ -0,0 +1,478 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import cleaning
+import extraction
+import metrics
+import scraping
+from content_store import ContentStore
+from corpus_index import CorpusIndex
+from db_handler import DB_ERRORS, DatabaseHandler
+from http_pool import PooledFetcher
+from render import RECORDS_DIR, render_study_pack
+from summarizer import summarize
+from video_lookup import VideoLookupStats
+
+TOP_TOPICS = 10
+QUEUE_SIZE = 8
+# Small clean batches let the top-ranked topic move on before the rest are classified.
+CLEAN_BATCH_SIZE = 4
+DONE = object()
+
+
+# ----------------------- Records -----------------------
+@dataclass
+class SubjectFiles:
+    subject_name: str
+    cdp_path: str
+    pyq_path: str
+    notes_path: str
+
+
+@dataclass
+class ExtractedSubject:
+    subject_name: str
+    cdp_topics: list
+    pyq_topics: list
+    notes_text: str
+    report: object = None
+
+
+@dataclass
+class RankedTopic:
+    subject_name: str
+    topic: str
+    position: int  # Place in the PageRank study order, before cleaning.
+    score: float = None  # PageRank score; None when the topics came ranked from elsewhere.
+    importance: float = None
+    rank: int = None  # Place among the kept topics, set by the clean stage.
+
+
+@dataclass
+class TopicArtifact:
+    topic: RankedTopic
+    content: str
+    url: str
+    page: dict = None  # Unsummarized page when new content was downloaded.
+    videos: list = field(default_factory=list)
+    pdf_path: str = None
+    finished_at: float = None
+
+    @property
+    def scraped(self):
+        return not self.content.startswith(("Failed to retrieve", "Error:"))
+
+
+# ----------------------- Metrics -----------------------
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds, failed=False):
+        with self.lock:
+            self.items += 1
+            self.busy += seconds
+            self.errors += failed
+
+
+class PipelineStats:
+    """Per-stage counts and busy time, time to the first finished artifact and throughput."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.first_artifact = None
+        self.artifacts = 0
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def stage(self, name):
+        return self.stages.setdefault(name, StageStats(name))
+
+    def artifact_done(self):
+        now = time.perf_counter()
+        with self.lock:
+            self.artifacts += 1
+            if self.first_artifact is None:
+                self.first_artifact = now
+        return now
+
+    @property
+    def total_s(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def first_artifact_s(self):
+        return None if self.first_artifact is None else self.first_artifact - self.started
+
+    @property
+    def throughput(self):
+        return self.artifacts / self.total_s if self.total_s else 0.0
+
+    def summary(self):
+        first = f"{self.first_artifact_s:.2f}s" if self.first_artifact is not None else "n/a"
+        lines = [f"Pipeline: {self.artifacts} artifacts in {self.total_s:.2f}s "
+                 f"(first after {first}, {self.throughput:.2f}/s)"]
+        for stage in self.stages.values():
+            lines.append(f" - {stage.name}: {stage.items} records, busy {stage.busy:.2f}s, errors {stage.errors}")
+        return "\n".join(lines)
+
+    def as_dict(self):
+        return {"artifacts": self.artifacts, "total_s": self.total_s, "first_artifact_s": self.first_artifact_s,
+                "throughput": self.throughput,
+                "stages": {stage.name: {"records": stage.items, "busy_s": stage.busy, "errors": stage.errors}
+                           for stage in self.stages.values()}}
+
+
+# ----------------------- Stage Runner -----------------------
+def start_stage(name, handle, inbox, outbox, stats, workers=1, flush=None):
+    """Starts `workers` threads that pass every record of `inbox` through `handle`.
+
+    `handle` returns the records to send downstream (possibly none). Once the
+    inbox is exhausted the last worker emits whatever `flush` returns, then DONE.
+    A record that raises is counted as an error and dropped. Each call runs in
+    a `stage_<name>` metrics span, with records in and out counted per stage.
+    """
+    stage_stats = stats.stage(name)
+    remaining = [workers]
+    lock = threading.Lock()
+
+    def emit(records):
+        for record in records or ():
+            outbox.put(record)
+
+    def work():
+        try:
+            while True:
+                record = inbox.get()
+                if record is DONE:
+                    inbox.put(DONE)  # Lets the other workers of this stage see the end too.
+                    break
+                start = time.perf_counter()
+                metrics.inc("stage_records", stage=name, direction="in")
+                try:
+                    with metrics.span(f"stage_{name}"):
+                        outputs = list(handle(record) or ())
+                    stage_stats.record(time.perf_counter() - start)
+                except Exception as e:
+                    stage_stats.record(time.perf_counter() - start, failed=True)
+                    print(f"{name} stage failed: {e}")
+                    continue
+                metrics.inc("stage_records", len(outputs), stage=name, direction="out")
+                emit(outputs)
+        finally:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                try:
+                    if flush:
+                        with metrics.span(f"stage_{name}"):
+                            outputs = list(flush() or ())
+                        metrics.inc("stage_records", len(outputs), stage=name, direction="out")
+                        emit(outputs)
+                except Exception as e:
+                    stage_stats.errors += 1
+                    print(f"{name} stage failed: {e}")
+                outbox.put(DONE)
+
+    threads = [threading.Thread(target=work, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+class CleanStage:
+    """Classifies ranked topics in rank order, a few per LLM prompt, and passes on the first `limit` kept ones.
+
+    Each prompt's kept topics go downstream together as one list, so the scrape
+    stage can fetch them in a single query.
+    """
+
+    def __init__(self, classify, limit=TOP_TOPICS, batch_size=CLEAN_BATCH_SIZE):
+        self.classify = classify
+        self.limit = limit
+        self.batch_size = batch_size
+        self.batch = []
+        self.kept = 0
+        self.skipped = 0
+
+    def handle(self, topic):
+        if self.kept >= self.limit:
+            self.skipped += 1  # Keep draining so the rank stage never blocks on a full queue.
+            return []
+        self.batch.append(topic)
+        return self.flush() if len(self.batch) >= self.batch_size else []
+
+    def flush(self):
+        batch, self.batch = self.batch, []
+        if not batch or self.kept >= self.limit:
+            return []
+        concepts = set(self.classify([topic.topic for topic in batch]))
+        kept = []
+        for topic in batch:
+            if topic.topic in concepts and self.kept < self.limit:
+                self.kept += 1
+                topic.rank = self.kept
+                kept.append(topic)
+        return [kept] if kept else []
+
+
+# ----------------------- Subject Pipeline -----------------------
+class SubjectPipeline:
+    """Runs extract -> rank -> clean -> scrape -> summarize -> videos -> render -> persist
+    as concurrent stages joined by bounded queues.
+
+    Records move through memory instead of subject.txt and study_order.json, so
+    the top-ranked topic is scraped and rendered while later topics are still
+    being cleaned, and concurrent runs for different subjects do not collide.
+    Topics kept by one clean prompt are scraped together, and the kept topics
+    are stored in one transaction once the run ends; an artifact counts as
+    finished when its PDF is rendered.
+    `fetch_videos` and `render` default to the scraping module's functions; video
+    searches go through `video_lookup` (the shared VideoLookup when not given), and
+    PDFs render on the shared process pool into `records_dir`. With `study_pack`,
+    the stored topics are also bound into one PDF in rank order.
+
+    Each run's stage stats and the metrics recorded meanwhile are kept in
+    `run_metrics` and, with `metrics_dir`, written to `<subject>.json` there next
+    to the process totals in Prometheus text format (edumate.prom). Runs that
+    overlap in one process share the metrics registry, so their deltas overlap too.
+    """
+
+    def __init__(self, subject_name, limit=TOP_TOPICS, db=None, store=None, base_url=scraping.WIKIPEDIA_URL,
+                 backend=None, rate=5.0, workers=4, queue_size=QUEUE_SIZE, clean_batch_size=CLEAN_BATCH_SIZE,
+                 ollama_url=None, verdict_cache=None, corpus_index=None, video_lookup=None, fetch_videos=None,
+                 render=None, records_dir=RECORDS_DIR, study_pack=True, metrics_dir=metrics.METRICS_DIR):
+        self.subject_name = subject_name
+        self.limit = limit
+        self.db = db
+        self.store = store if store is not None else ContentStore()
+        self.base_url = base_url
+        self.backend = backend or scraping.SCRAPE_BACKEND
+        self.rate = rate
+        self.workers = workers
+        self.queue_size = queue_size
+        self.clean_batch_size = clean_batch_size
+        self.ollama_url = ollama_url
+        self.verdict_cache = verdict_cache if verdict_cache is not None else cleaning.VerdictCache()
+        self.clean_stats = cleaning.CleanStats()
+        self.corpus_index = corpus_index if corpus_index is not None else CorpusIndex()
+        self.video_lookup = video_lookup
+        self.video_stats = VideoLookupStats()
+        self.fetch_videos = fetch_videos or (
+            lambda topic: scraping.fetch_top_youtube_videos(topic, self.video_lookup, self.video_stats))
+        self.records_dir = records_dir
+        self.render = render or (lambda topic, content, videos: scraping.save_to_pdf(topic, content, videos, records_dir))
+        self.study_pack = study_pack
+        self.study_pack_path = None
+        self.metrics_dir = metrics_dir
+        self.run_metrics = None
+        self.fetcher = None
+        self.own_db = False
+        self.stats = None
+        self.ranked_topics = []
+        self.adjacency_list = {}
+        self.importance_score = {}
+        self.topic_graph = None
+        self.artifacts = []
+
+    def run(self, cdp_path, pyq_path, notes_path):
+        """Processes a subject from its three PDFs; returns the TopicArtifacts in rank order."""
+        return self._run("extract", [SubjectFiles(self.subject_name, cdp_path, pyq_path, notes_path)])
+
+    def run_topics(self, topics):
+        """Processes an already ranked topic list, skipping extraction and ranking."""
+        records = [RankedTopic(self.subject_name, topic, position) for position, topic in enumerate(topics, 1)]
+        return self._run("clean", records)
+
+    def _run(self, first_stage, records):
+        before = metrics.snapshot()
+        self.stats = PipelineStats()
+        self.video_stats = VideoLookupStats()
+        self.artifacts = []
+        self.ranked_topics = []  # Set by the rank stage; run_topics gets its order from elsewhere.
+        clean = CleanStage(self.classify, self.limit, self.clean_batch_size)
+        stages = [
+            ("extract", self.extract, 1, None),
+            ("rank", self.rank, 1, None),
+            ("clean", clean.handle, 1, clean.flush),
+            ("scrape", self.scrape, self.workers, None),
+            ("summarize", self.summarize, 1, None),
+            ("videos", self.videos, self.workers, None),
+            ("render", self.render_pdf, self.workers, None),
+            ("persist", self.persist, 1, self.write_topics),
+        ]
+        stages = stages[[name for name, _, _, _ in stages].index(first_stage):]
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(stages) + 1)]
+        self.fetcher = PooledFetcher(rate=self.rate, pool_size=self.workers,
+                                     headers={'User-Agent': scraping.USER_AGENT})
+        threads = []
+        try:
+            for (name, handle, workers, flush), inbox, outbox in zip(stages, queues, queues[1:]):
+                threads += start_stage(name, handle, inbox, outbox, self.stats, workers, flush)
+            for record in records:
+                queues[0].put(record)
+            queues[0].put(DONE)
+            for thread in threads:
+                thread.join()
+        finally:
+            self.fetcher.close()
+            self.verdict_cache.save()  # Once per run rather than after every clean batch.
+            scraping.save_video_cache(self.video_lookup)
+            self.stats.finished = time.perf_counter()
+        if clean.skipped:
+            print(f"Stopped cleaning after {self.limit} topics; {clean.skipped} lower-ranked candidates skipped.")
+        print(f"Clean stage: {self.clean_stats.summary()}")
+        print(f"Videos stage: {self.video_stats.summary()}")
+        self.artifacts.sort(key=lambda artifact: artifact.topic.rank)
+        if self.study_pack and self.artifacts:
+            with metrics.span("study_pack"):
+                self.study_pack_path, rendered = render_study_pack(
+                    self.subject_name, [(artifact.topic.topic, artifact.content, artifact.videos)
+                                        for artifact in self.artifacts], self.records_dir)
+            print(f"{'Saved' if rendered else 'Up to date'}: {self.study_pack_path}")
+        self.run_metrics = {"subject": self.subject_name, "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                            "pipeline": self.stats.as_dict(), **metrics.delta(metrics.snapshot(), before)}
+        if self.metrics_dir:
+            self.export_metrics()
+        return self.artifacts
+
+    def export_metrics(self):
+        name = self.subject_name.replace(os.sep, "_").replace(" ", "_")
+        metrics.write_json(os.path.join(self.metrics_dir, f"{name}.json"), self.run_metrics)
+        metrics.write_prometheus(os.path.join(self.metrics_dir, "edumate.prom"))
+        print(f"Metrics: {os.path.join(self.metrics_dir, name)}.json")
+
+    # ----------------------- Stages -----------------------
+    def extract(self, files):
+        # The long notes file starts decoding while the CDP and PYQ are split.
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            notes_future = executor.submit(extraction.extract_text_from_pdf, files.notes_path)
+            cdp_future = executor.submit(extraction.extract_topics_with_report, files.cdp_path)
+            pyq_future = executor.submit(extraction.extract_topics_from_pdf, files.pyq_path)
+            cdp_topics, cdp_report = cdp_future.result()
+            return [ExtractedSubject(files.subject_name, cdp_topics, pyq_future.result(),
+                                     notes_future.result(), cdp_report)]
+
+    def rank(self, subject):
+        ranking_start = time.perf_counter()
+        self.adjacency_list, self.importance_score = extraction.create_adjacency_list(
+            subject.cdp_topics, subject.notes_text, subject.pyq_topics, self.corpus_index, subject.subject_name)
+        self.corpus_index.save()
+        self.topic_graph = extraction.as_topic_graph(self.adjacency_list)
+        previous_scores = self.stored_scores(subject.subject_name)
+        self.ranked_topics = extraction.rank_topics_with_pagerank(self.topic_graph, previous_scores)
+        if previous_scores:
+            print(f"Re-ranked from {len(previous_scores)} stored scores in {self.topic_graph.iterations} iterations.")
+        if subject.report is not None:
+            extraction.report_prefilter_savings(subject.report, time.perf_counter() - ranking_start)
+        return [RankedTopic(subject.subject_name, topic, position, score, self.importance_score.get(topic))
+                for position, (topic, score) in enumerate(self.ranked_topics, 1)]
+
+    def stored_scores(self, subject_name):
+        """Every candidate's PageRank score from the subject's last run (batch.py --existing update re-runs it),
+        to warm-start re-ranking; None if there are none."""
+        try:
+            if self.db is not None:
+                return self.db.pagerank_scores(subject_name) or None
+            with DatabaseHandler() as db:
+                return db.pagerank_scores(subject_name) or None
+        except DB_ERRORS as e:
+            print(f"Could not read stored PageRank scores: {e}")
+            return None
+
+    def classify(self, titles):
+        return cleaning.clean_list(titles, batch_size=len(titles), max_workers=1, base_url=self.ollama_url,
+                                   cache=self.verdict_cache, stats=self.clean_stats, save=False)
+
+    def scrape(self, topics):
+        """Scrapes one clean batch: a single extracts query with the "api" backend, concurrent pages otherwise."""
+        artifacts, pending = {}, []
+        for topic in topics:
+            summary = self.store.lookup(topic.topic, "summary")
+            if summary is not None:
+                print(f"Reused stored summary: {topic.topic}")
+                artifacts[topic.topic] = TopicArtifact(topic, summary, self.store.get(topic.topic)["page"]["url"])
+            else:
+                pending.append(topic)
+        if pending:
+            titles = [topic.topic for topic in pending]
+            if self.backend == "api":
+                outcomes = scraping.scrape_batch_api(self.fetcher, titles, self.base_url, self.store)
+            else:
+                with ThreadPoolExecutor(max_workers=len(titles)) as executor:
+                    outcomes = dict(zip(titles, executor.map(
+                        lambda title: scraping.scrape_topic(self.fetcher, title, self.base_url, self.store), titles)))
+            for topic in pending:
+                result, page = outcomes[topic.topic]
+                artifacts[topic.topic] = TopicArtifact(topic, result['content'], result['url'], page)
+        return [artifacts[topic.topic] for topic in topics]
+
+    def summarize(self, artifact):
+        if artifact.page is not None:
+            artifact.content = summarize(artifact.page['text'])
+            self.store.put(artifact.topic.topic, summary=artifact.content, page=artifact.page)
+            artifact.page = None
+            print(f"Successfully scraped and summarized: {artifact.topic.topic}")
+        return [artifact]
+
+    def videos(self, artifact):
+        videos = self.store.lookup(artifact.topic.topic, "videos")
+        if videos is None:
+            videos = self.fetch_videos(artifact.topic.topic)
+            if artifact.scraped and videos:
+                self.store.put(artifact.topic.topic, videos=videos)
+        artifact.videos = videos
+        return [artifact]
+
+    def render_pdf(self, artifact):
+        pdf_path = self.store.lookup(artifact.topic.topic, "pdf_path")
+        if pdf_path is None:
+            pdf_path = self.render(artifact.topic.topic, artifact.content, artifact.videos)
+            if artifact.scraped:
+                self.store.put(artifact.topic.topic, pdf_path=pdf_path)
+        artifact.pdf_path = pdf_path
+        artifact.finished_at = self.stats.artifact_done()
+        return [artifact]
+
+    def persist(self, artifact):
+        # Runs on the single persist thread; the rows are written together by write_topics.
+        self.artifacts.append(artifact)
+        return []
+
+    def write_topics(self):
+        """Stores the run's kept topics in one transaction, replacing the subject's stored ranking,
+        and every candidate's PageRank score for the next re-ranking."""
+        if not self.artifacts and not self.ranked_topics:
+            return []
+        if self.db is None:
+            self.db = DatabaseHandler()
+            self.own_db = True
+        try:
+            if self.artifacts:
+                # Topics that left the top list since the last run are dropped.
+                self.db.insert_scraped_topics(self.subject_name, [
+                    (artifact.topic.topic, artifact.pdf_path, artifact.topic.rank, artifact.topic.importance)
+                    for artifact in self.artifacts], replace=True)
+            self.db.save_pagerank_scores(self.subject_name, dict(self.ranked_topics))
+        finally:
+            if self.own_db:
+                self.db.close()
+                self.db, self.own_db = None, False
+        return []
+
+
+def run_pipeline(subject_name, cdp_path, pyq_path, notes_path, **options):
+    """Runs a SubjectPipeline over a subject's PDFs and returns it with its artifacts and stats."""
+    pipeline = SubjectPipeline(subject_name, **options)
+    pipeline.run(cdp_path, pyq_path, notes_path)
+    return pipeline
@@ -0,0 +1,106 @@
+import re
+from collections import Counter
+
+MIN_CHARS = 2
+MAX_CHARS = 80
+MAX_TOKENS = 10
+# Running headers/footers repeat on at least this many pages, and on half of them.
+MIN_HEADER_PAGES = 3
+
+# Words a real topic title neither starts nor ends with; fragments like "comparison of"
+# or "with analysis and" are pieces of a sentence that the comma split cut in two.
+DANGLING_END = {"a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "for", "with", "by", "from",
+                "as", "some", "such", "is", "are", "be", "via", "into", "than", "then", "its", "their"}
+DANGLING_START = {"and", "or", "but", "with", "as", "etc", "is", "are", "which", "that"}
+STOP_WORDS = DANGLING_END | DANGLING_START | {"this", "these", "those", "it", "we", "you", "all", "any", "other"}
+# Course-plan headings and field labels, never study topics on their own.
+BOILERPLATE_PATTERNS = [re.compile(pattern) for pattern in (
+    r"^(unit|module|chapter|week|lecture|part|section|co|po|pso)\s*[-:]?\s*([0-9]+|[ivx]+)$",
+    r"^course (development plan|objectives?|outcomes?|overview|code|title|description)\b",
+    r"^(subject|course) (name|code)\b",
+    r"^(faculty|instructor|professor|semester|credits?|hours|prerequisites?|department|page)\b",
+    r"^(syllabus|introduction|examples|applications|overview|objectives|outcomes|references|"
+    r"text ?books?|reference books?|evaluation|assessment)$",
+    r"^(this|the) course\b",
+)]
+TRAILING_NOISE = re.compile(r"(\s+(etc|etc\.|and so on)|[\s:;,\-–—/]+)$")
+
+
+def normalize_candidate(candidate):
+    """Lowercases, collapses whitespace and strips trailing punctuation and 'etc'."""
+    text = " ".join(candidate.lower().split())
+    previous = None
+    while text != previous:
+        previous = text
+        text = TRAILING_NOISE.sub("", text).strip()
+    return text.lstrip("-–—•*:;, ")
+
+
+def variant_key(candidate):
+    """Key under which near-identical variants ('sorting algorithm' / 'sorting algorithms') collide."""
+    tokens = re.findall(r"[a-z0-9]+", candidate)
+    return " ".join(token[:-1] if len(token) > 3 and token.endswith("s") else token for token in tokens)
+
+
+def learn_boilerplate(pages):
+    """Lines repeated on most of a document's pages, such as running headers and footers."""
+    lines = Counter()
+    for page in pages:
+        lines.update({normalize_candidate(line) for line in page.lower().splitlines() if line.strip()})
+    threshold = max(MIN_HEADER_PAGES, len(pages) / 2)
+    return {line for line, count in lines.items() if count >= threshold}
+
+
+def rejection_reason(candidate, boilerplate=()):
+    tokens = candidate.split()
+    if len(candidate) < MIN_CHARS or len(candidate) > MAX_CHARS or len(tokens) > MAX_TOKENS:
+        return "length"
+    if not re.search(r"[a-z]", candidate):
+        return "no letters"
+    if all(token in STOP_WORDS for token in tokens):
+        return "stopwords only"
+    if candidate in boilerplate or any(pattern.search(candidate) for pattern in BOILERPLATE_PATTERNS):
+        return "boilerplate"
+    if tokens[0] in DANGLING_START or tokens[-1] in DANGLING_END:
+        return "sentence fragment"
+    return None
+
+
+# ----------------------- Candidate Pre-filter -----------------------
+class PrefilterReport:
+    def __init__(self, total):
+        self.total = total
+        self.kept = 0
+        self.removed = Counter()
+
+    def __str__(self):
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in self.removed.most_common())
+        return (f"Pre-filter kept {self.kept} of {self.total} candidate topics"
+                + (f" (removed {reasons})" if reasons else ""))
+
+
+def prefilter_topics(candidates, pages=()):
+    """Drops fragments that cannot be topics before ranking and LLM cleaning.
+
+    `pages` are the page texts the candidates were split from; lines repeated on
+    most pages are treated as running headers. Returns (kept topics, PrefilterReport).
+    Kept topics are normalized, and of several variants the shortest one is kept.
+    """
+    report = PrefilterReport(len(candidates))
+    boilerplate = learn_boilerplate(pages) if pages else set()
+    variants = {}
+    for candidate in candidates:
+        topic = normalize_candidate(candidate)
+        reason = rejection_reason(topic, boilerplate)
+        if reason:
+            report.removed[reason] += 1
+            continue
+        key = variant_key(topic)
+        if key in variants:
+            report.removed["duplicate variant"] += 1
+            variants[key] = min(variants[key], topic, key=lambda t: (len(t), t))
+        else:
+            variants[key] = topic
+    kept = list(variants.values())
+    report.kept = len(kept)
+    return kept, report
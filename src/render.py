@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+RECORDS_DIR = "records"
+# Bump when the page layout changes so every artifact is rendered again.
+TEMPLATE_VERSION = 1
+DIGEST_MARKER = "edumate-render:"
+# Fewer documents than this render in-process; starting workers costs more than it saves.
+PARALLEL_MIN_DOCUMENTS = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def remove_unicode(text):
+    """Folds text to ASCII the way FPDF's core fonts need, dropping what has no ASCII form."""
+    if text.isascii():
+        return text
+    return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode()
+
+
+def render_digest(*inputs):
+    payload = json.dumps([TEMPLATE_VERSION, *inputs], ensure_ascii=False, default=list)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def topic_pdf_path(topic, records_dir=RECORDS_DIR):
+    name = remove_unicode(topic).replace(' ', '_').replace(os.sep, '_')
+    return f"{records_dir}/{name}.pdf"
+
+
+def is_current(path, digest):
+    """True when `path` was rendered from inputs with this digest (stored in the PDF's keywords)."""
+    try:
+        with open(path, "rb") as f:
+            return f"{DIGEST_MARKER}{digest}".encode("ascii") in f.read()
+    except OSError:
+        return False
+
+
+# ----------------------- Page Layout -----------------------
+def write_topic(pdf, topic, content, youtube_videos):
+    topic = remove_unicode(topic)
+    content = remove_unicode(content)
+    youtube_videos = [(remove_unicode(title), remove_unicode(link)) for title, link in youtube_videos]
+    pdf.add_page()
+    pdf.set_font("Arial", style='', size=16)
+    pdf.cell(200, 10, topic, ln=True, align='C')
+    pdf.ln(10)
+    pdf.set_font("Arial", size=12)
+    pdf.multi_cell(0, 10, content)
+    pdf.ln(10)
+    pdf.set_font("Arial", style='', size=14)
+    pdf.cell(0, 10, "Top YouTube Videos:", ln=True)
+    pdf.set_font("Arial", size=12)
+    for title, link in youtube_videos:
+        pdf.multi_cell(0, 10, f"{title}\n{link}\n")
+        pdf.ln(10)
+
+
+def write_atomic(pdf, path, digest):
+    """Writes the document under a temporary name, then renames it over `path`,
+    so readers and concurrent writers of the same file never see a partial PDF."""
+    pdf.set_keywords(f"{DIGEST_MARKER}{digest}")
+    data = pdf.output(dest="S")
+    data = data.encode("latin-1") if isinstance(data, str) else bytes(data)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# ----------------------- Rendering -----------------------
+def render_topic_pdf(topic, content, youtube_videos, records_dir=RECORDS_DIR):
+    """Renders one topic's PDF unless the file on disk came from the same inputs.
+
+    Returns (path, rendered), where rendered is False when the file was up to date.
+    """
+    from fpdf import FPDF
+
+    youtube_videos = [tuple(video) for video in youtube_videos]
+    path = topic_pdf_path(topic, records_dir)
+    digest = render_digest(topic, content, youtube_videos)
+    if is_current(path, digest):
+        return path, False
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    write_topic(pdf, topic, content, youtube_videos)
+    write_atomic(pdf, path, digest)
+    return path, True
+
+
+def shared_pool():
+    """Process pool shared by every caller in this process, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _pool
+
+
+def render_pooled(topic, content, youtube_videos, records_dir=RECORDS_DIR):
+    """render_topic_pdf on the shared process pool; up-to-date files are detected without a round trip.
+
+    Blocks until the file is written, so many threads can each render one topic in parallel.
+    """
+    youtube_videos = [tuple(video) for video in youtube_videos]
+    path = topic_pdf_path(topic, records_dir)
+    if is_current(path, render_digest(topic, content, youtube_videos)):
+        return path, False
+    if (os.cpu_count() or 1) <= 1:
+        return render_topic_pdf(topic, content, youtube_videos, records_dir)
+    return shared_pool().submit(render_topic_pdf, topic, content, youtube_videos, records_dir).result()
+
+
+def render_many(documents, records_dir=RECORDS_DIR, max_workers=None):
+    """Renders [(topic, content, videos)] across a process pool; returns [(path, rendered)] in order."""
+    documents = [(topic, content, [tuple(video) for video in videos]) for topic, content, videos in documents]
+    stale = [i for i, (topic, content, videos) in enumerate(documents)
+             if not is_current(topic_pdf_path(topic, records_dir), render_digest(topic, content, videos))]
+    results = [(topic_pdf_path(topic, records_dir), False) for topic, _, _ in documents]
+    max_workers = max_workers or min(len(stale), os.cpu_count() or 1)
+    if max_workers <= 1 or len(stale) < PARALLEL_MIN_DOCUMENTS:
+        for i in stale:
+            results[i] = render_topic_pdf(*documents[i], records_dir)
+        return results
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {i: executor.submit(render_topic_pdf, *documents[i], records_dir) for i in stale}
+        for i, future in futures.items():
+            results[i] = future.result()
+    return results
+
+
+def render_study_pack(subject_name, documents, records_dir=RECORDS_DIR):
+    """Renders one PDF with a contents page and every [(topic, content, videos)] in the given (ranked) order.
+
+    Returns (path, rendered) like render_topic_pdf.
+    """
+    from fpdf import FPDF
+
+    documents = [(topic, content, [tuple(video) for video in videos]) for topic, content, videos in documents]
+    path = topic_pdf_path(f"{subject_name} study pack", records_dir)
+    digest = render_digest(subject_name, documents)
+    if is_current(path, digest):
+        return path, False
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.set_font("Arial", style='', size=18)
+    pdf.cell(0, 12, remove_unicode(f"{subject_name}: Study Pack"), ln=True, align='C')
+    pdf.ln(8)
+    pdf.set_font("Arial", size=12)
+    for rank, (topic, _, _) in enumerate(documents, 1):
+        pdf.cell(0, 8, remove_unicode(f"{rank}. {topic}"), ln=True)
+    for topic, content, videos in documents:
+        write_topic(pdf, topic, content, videos)
+    write_atomic(pdf, path, digest)
+    return path, True
@@ -1,124 +1,236 @@
 import os
-import requests
-import cleaning
-from bs4 import BeautifulSoup
-import time
-import random
 import re
-import nltk
-from nltk.tokenize import sent_tokenize, word_tokenize
-from collections import Counter
-from fpdf import FPDF
 import json
-import unicodedata
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from db_handler import DatabaseHandler
+import metrics
+import render
+from http_pool import PooledFetcher
+from summarizer import summarize, summarize_many
+from video_lookup import VideoLookup
 
-def scrape_data(topics):
-    results = []
+WIKIPEDIA_URL = "https://en.wikipedia.org"
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+# "api" asks the MediaWiki API for plain-text extracts in bulk, "html" parses each article page.
+SCRAPE_BACKEND = os.getenv("EDUMATE_SCRAPE_BACKEND", "api")
+# Titles per extracts query. TextExtracts returns only one whole-article extract per response (several
+# need exintro), so the rest of a batch is fetched page by page, MEDIAWIKI_CONCURRENCY at a time.
+MEDIAWIKI_BATCH_LIMIT = 20
+MEDIAWIKI_CONCURRENCY = 8
+
+def scrape_data(topics, base_url=WIKIPEDIA_URL, max_workers=8, rate=5.0, fetcher=None, backend=None, store=None):
+    """Scrapes and summarizes the Wikipedia page of every topic concurrently.
+
+    Requests share one pooled session and a per-host token bucket of `rate`
+    requests per second; results keep the order of `topics`. With the "api"
+    backend, batches the API cannot answer fall back to the HTML pages.
+    Topics with a fresh summary in `store` (a ContentStore) are not fetched,
+    and expired HTML pages are revalidated with a conditional request. Fetched
+    pages are summarized together across a process pool.
+    """
+    backend = backend or SCRAPE_BACKEND
+    results = {}
+    pending = []
     for topic in topics:
-        try:
-            formatted_topic = topic.replace(' ', '_')
-            url = f"https://en.wikipedia.org/wiki/{formatted_topic}"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                content_div = soup.find('div', {'id': 'mw-content-text'})
-                if content_div:
-                    paragraphs = content_div.find_all('p')
-                    text_content = " ".join([p.get_text() for p in paragraphs])
-                    # Remove citation references like [1], [23], etc.
-                    text_content = re.sub(r'\[\d+\]', '', text_content)
-                    summarized_content = summarize_text(text_content)
-                    results.append({
-                        'topic': topic,
-                        'content': summarized_content,
-                        'url': url
-                    })
-                    print(f"Successfully scraped and summarized: {topic}")
-                else:
-                    print(f"Could not find content for: {topic}")
-                    results.append({'topic': topic, 'content': "No content found", 'url': url})
+        summary = store.lookup(topic, "summary") if store else None
+        if summary is not None:
+            results[topic] = {'topic': topic, 'content': summary, 'url': store.get(topic)["page"]["url"]}
+            print(f"Reused stored summary: {topic}")
+        else:
+            pending.append(topic)
+    pending = list(dict.fromkeys(pending))
+    if not pending:
+        return [results[topic] for topic in topics]
+
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = PooledFetcher(rate=rate, pool_size=max_workers, headers={'User-Agent': USER_AGENT})
+    fetched = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            if backend != "api":
+                for topic, outcome in zip(pending, executor.map(
+                        lambda topic: scrape_topic(fetcher, topic, base_url, store), pending)):
+                    fetched[topic] = outcome
             else:
-                print(f"Failed to retrieve page for: {topic}. Status code: {response.status_code}")
-                results.append({'topic': topic, 'content': f"Failed to retrieve. Status code: {response.status_code}", 'url': url})
-            time.sleep(random.uniform(1, 3))
-        except Exception as e:
-            print(f"Error scraping {topic}: {str(e)}")
-            results.append({'topic': topic, 'content': f"Error: {str(e)}", 'url': url if 'url' in locals() else None})
-    return results
+                batches = [pending[i:i + MEDIAWIKI_BATCH_LIMIT] for i in range(0, len(pending), MEDIAWIKI_BATCH_LIMIT)]
+                for batch_outcomes in executor.map(lambda batch: scrape_batch_api(fetcher, batch, base_url, store), batches):
+                    fetched.update(batch_outcomes)
+    finally:
+        if own_fetcher:
+            fetcher.close()
 
-def summarize_text(text, num_sentences=5):
-    sentences = sent_tokenize(text)
-    if len(sentences) <= num_sentences:
-        return text
-    words = word_tokenize(text.lower())
-    word_frequencies = Counter(words)
-    sentence_scores = {
-        sentence: sum(word_frequencies[word] for word in word_tokenize(sentence.lower()) if word in word_frequencies)
-        for sentence in sentences}
-    summarized_sentences = sorted(sentence_scores, key=sentence_scores.get, reverse=True)[:num_sentences]
-    return " ".join(summarized_sentences)
-
-def fetch_top_youtube_videos(topic):
-    YOUTUBE_API_KEY = os.getenv('YOUTUBE_API')
-    url = "https://www.googleapis.com/youtube/v3/search"
+    # Pages come back as full text; summarize them all at once off the fetch threads.
+    new_pages = [(topic, page) for topic, (result, page) in fetched.items() if page is not None]
+    summaries = summarize_many([page['text'] for _, page in new_pages])
+    for (topic, page), summary in zip(new_pages, summaries):
+        fetched[topic][0]['content'] = summary
+        if store:
+            store.put(topic, summary=summary, page=page)
+        print(f"Successfully scraped and summarized: {topic}")
+    results.update({topic: result for topic, (result, page) in fetched.items()})
+    return [results[topic] for topic in topics]
+
+def scrape_topic(fetcher, topic, base_url=WIKIPEDIA_URL, store=None):
+    """Fetches one article page. Returns (result, page), where page holds the
+    unsummarized text and validators when new content was downloaded, else None."""
+    url = None
+    try:
+        formatted_topic = topic.replace(' ', '_')
+        url = f"{base_url}/wiki/{formatted_topic}"
+        entry = store.get(topic) if store else None
+        page = entry.get("page") if entry else None
+        headers = {}
+        if page and page.get("etag"):
+            headers['If-None-Match'] = page["etag"]
+        if page and page.get("last_modified"):
+            headers['If-Modified-Since'] = page["last_modified"]
+        response = fetcher.get(url, headers=headers)
+        if response.status_code == 304 and entry.get("summary") is not None:
+            store.touch(topic, "page")
+            store.touch(topic, "summary")
+            with store.lock:
+                store.bytes_saved += page.get("bytes", 0)
+            print(f"Not modified since last scrape: {topic}")
+            return {'topic': topic, 'content': entry["summary"], 'url': page["url"]}, None
+        if response.status_code == 200:
+            text_content = parse_wikipedia_html(response.text)
+            if text_content is not None:
+                return {'topic': topic, 'content': text_content, 'url': url}, {
+                    'url': url, 'text': text_content, 'bytes': len(response.content),
+                    'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+            print(f"Could not find content for: {topic}")
+            return {'topic': topic, 'content': "No content found", 'url': url}, None
+        print(f"Failed to retrieve page for: {topic}. Status code: {response.status_code}")
+        return {'topic': topic, 'content': f"Failed to retrieve. Status code: {response.status_code}", 'url': url}, None
+    except Exception as e:
+        print(f"Error scraping {topic}: {str(e)}")
+        return {'topic': topic, 'content': f"Error: {str(e)}", 'url': url}, None
+
+def parse_wikipedia_html(html):
+    """Returns the article's paragraph text without citation markers, or None if there is no content div."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    content_div = soup.find('div', {'id': 'mw-content-text'})
+    if not content_div:
+        return None
+    paragraphs = content_div.find_all('p')
+    text_content = " ".join([p.get_text() for p in paragraphs])
+    # Remove citation references like [1], [23], etc.
+    return re.sub(r'\[\d+\]', '', text_content)
+
+# ----------------------- MediaWiki API Backend -----------------------
+def fetch_extracts(fetcher, titles, base_url=WIKIPEDIA_URL):
+    """Fetches plain-text extracts for up to MEDIAWIKI_BATCH_LIMIT titles.
+
+    The batch query resolves every title and returns the first extract; the
+    remaining pages are then requested by their resolved titles, several at once.
+    Returns ({requested title: (page title, extract)}, [titles that don't exist]).
+    Normalization and redirects are followed back to the requested titles.
+    """
     params = {
-        "part": "snippet",
-        "q": topic,
-        "maxResults": 5,
-        "type": "video",
-        "key": YOUTUBE_API_KEY
+        "action": "query", "format": "json", "formatversion": "2", "prop": "extracts",
+        "explaintext": "1", "exlimit": "max", "redirects": "1",
     }
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        video_results = []
-        for item in data.get("items", []):
-            title = item["snippet"]["title"]
-            video_id = item["id"]["videoId"]
-            link = f"https://www.youtube.com/watch?v={video_id}"
-            video_results.append((title, link))
-        return video_results
-    else:
-        print(f"Failed to fetch YouTube videos: {response.status_code}")
-        return []
+    pages, normalized, redirects = {}, {}, {}
+
+    def query(titles):
+        response = fetcher.get(f"{base_url}/w/api.php", params={**params, "titles": "|".join(titles)})
+        response.raise_for_status()
+        query = response.json().get("query", {})
+        normalized.update({entry["from"]: entry["to"] for entry in query.get("normalized", [])})
+        redirects.update({entry["from"]: entry["to"] for entry in query.get("redirects", [])})
+        for page in query.get("pages", []):
+            if "extract" in page or page["title"] not in pages:
+                pages[page["title"]] = page
+
+    query(titles)
+    remaining = [title for title, page in pages.items()
+                 if "extract" not in page and not page.get("missing") and not page.get("invalid")]
+    if remaining:
+        with ThreadPoolExecutor(max_workers=min(len(remaining), MEDIAWIKI_CONCURRENCY)) as executor:
+            list(executor.map(lambda title: query([title]), remaining))
+
+    found, missing = {}, []
+    for title in titles:
+        resolved = normalized.get(title, title)
+        resolved = redirects.get(resolved, resolved)
+        page = pages.get(resolved)
+        if page is None or page.get("missing") or page.get("invalid"):
+            missing.append(title)
+        else:
+            found[title] = (page["title"], page.get("extract", ""))
+    return found, missing
+
+def extract_to_text(extract):
+    """Drops the '== Section ==' heading lines that explaintext extracts keep."""
+    return re.sub(r"^=+[^=\n]*=+\s*$", "", extract, flags=re.MULTILINE).strip()
+
+def scrape_batch_api(fetcher, topics, base_url=WIKIPEDIA_URL, store=None):
+    """Fetches extracts for a batch of topics. Returns {topic: (result, page)} like scrape_topic."""
+    try:
+        found, missing = fetch_extracts(fetcher, [topic.replace(' ', '_') for topic in topics], base_url)
+    except Exception as e:
+        print(f"MediaWiki API failed ({e}); falling back to HTML pages for {len(topics)} topics.")
+        return {topic: scrape_topic(fetcher, topic, base_url, store) for topic in topics}
+
+    if missing:
+        print(f"No Wikipedia page for: {', '.join(title.replace('_', ' ') for title in missing)}")
+    outcomes = {}
+    for topic in topics:
+        formatted_topic = topic.replace(' ', '_')
+        if formatted_topic not in found:
+            outcomes[topic] = {'topic': topic, 'content': "No content found", 'url': f"{base_url}/wiki/{formatted_topic}"}, None
+            continue
+        page_title, extract = found[formatted_topic]
+        url = f"{base_url}/wiki/{page_title.replace(' ', '_')}"
+        text_content = extract_to_text(extract)
+        if text_content:
+            # API extracts carry no validators, so expired entries are simply fetched again.
+            outcomes[topic] = {'topic': topic, 'content': text_content, 'url': url}, {
+                'url': url, 'text': text_content, 'bytes': len(extract.encode('utf-8')),
+                'etag': None, 'last_modified': None}
+        else:
+            print(f"Could not find content for: {topic}")
+            outcomes[topic] = {'topic': topic, 'content': "No content found", 'url': url}, None
+    return outcomes
+
+def summarize_text(text, num_sentences=5):
+    return summarize(text, num_sentences)
+
+_video_lookup = None
+_video_lookup_lock = threading.Lock()
+
+def default_video_lookup():
+    """The process-wide VideoLookup, created on first use."""
+    global _video_lookup
+    with _video_lookup_lock:
+        if _video_lookup is None:
+            _video_lookup = VideoLookup()
+        return _video_lookup
+
+def save_video_cache(lookup=None):
+    """Writes pending video cache changes; the process-wide lookup only when it was ever used."""
+    lookup = lookup or _video_lookup
+    if lookup is not None:
+        lookup.save()
+
+def fetch_top_youtube_videos(topic, lookup=None, stats=None):
+    """Top 5 YouTube videos as [(title, link)], from the cache when searched recently."""
+    return (lookup or default_video_lookup()).search(topic, stats)
 
 def remove_unicode(text):
     # Normalize Unicode characters to ASCII-compatible form
-    return ''.join(c if ord(c) < 128 else unicodedata.normalize('NFKD', c).encode('ASCII', 'ignore').decode() for c in text)
-
-def save_to_pdf(topic, content, youtube_videos):
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    # Normalize text to remove Unicode issues
-    topic = remove_unicode(topic)
-    content = remove_unicode(content)
-    youtube_videos = [(remove_unicode(title), remove_unicode(link)) for title, link in youtube_videos]
-    # Title
-    pdf.set_font("Arial", style='', size=16)
-    pdf.cell(200, 10, topic, ln=True, align='C')
-    pdf.ln(10)
-    pdf.set_font("Arial", size=12)
-    pdf.multi_cell(0, 10, content)
-    pdf.ln(10)
-    pdf.set_font("Arial", style='', size=14)
-    pdf.cell(0, 10, "Top YouTube Videos:", ln=True)
-    pdf.set_font("Arial", size=12)
-    for title, link in youtube_videos:
-        pdf.multi_cell(0, 10, f"{title}\n{link}\n")
-        pdf.ln(10)
-    # Save PDF in records folder
-    if not os.path.exists("records"):
-        os.makedirs("records")
-    file_name = f"records/{topic.replace(' ', '_')}.pdf"
-    pdf.output(file_name, "F")
-    print(f"Saved: {file_name}")
+    return render.remove_unicode(text)
+
+def save_to_pdf(topic, content, youtube_videos, records_dir="records"):
+    """Renders a topic's PDF in the records folder, unless it is already up to date; returns its path."""
+    with metrics.span("render_pdf"):
+        file_name, rendered = render.render_pooled(topic, content, youtube_videos, records_dir)
+    metrics.inc("cache_lookups", cache="pdf", result="miss" if rendered else "hit")
+    print(f"Saved: {file_name}" if rendered else f"Up to date: {file_name}")
     return file_name  # Return PDF file path for DB insertion
 
 def extract_topics_from_json(file_path):
@@ -133,25 +245,27 @@ def extract_topics_from_json(file_path):
         print(f"Error: {e}")
         return []
 
-def scrap():
-    # Read subject name from temporary file generated by extraction.py
-    if os.path.exists("subject.txt"):
-        with open("subject.txt", "r") as f:
-            subject_name = f.read().strip()
-    else:
-        subject_name = "unknown_subject"
-    topics = extract_topics_from_json("study_order.json")
-    topics = cleaning.clean_list(topics)
-    topics = sorted(topics[:10])
-    scraped_data = scrape_data(topics)
-
-    db = DatabaseHandler()  # Initialize DB handler
-    for data in scraped_data:
-        youtube_videos = fetch_top_youtube_videos(data['topic'])
-        pdf_path = save_to_pdf(data['topic'], data['content'], youtube_videos)
-        # Insert scraped data into the subject-specific table (with two columns: topic_name and file_name)
-        db.insert_scraped_topic(subject_name, data['topic'], pdf_path)
+def scrap(subject_name=None, topics=None):
+    """Cleans, scrapes, renders and stores the top topics of an already ranked study order.
+
+    Without arguments the subject and study order are read from subject.txt and
+    study_order.json in the working directory.
+    """
+    import pipeline  # pipeline builds on this module
+
+    if subject_name is None:
+        if os.path.exists("subject.txt"):
+            with open("subject.txt", "r") as f:
+                subject_name = f.read().strip()
+        else:
+            subject_name = "unknown_subject"
+    if topics is None:
+        topics = extract_topics_from_json("study_order.json")
+    subject_pipeline = pipeline.SubjectPipeline(subject_name)
+    subject_pipeline.run_topics(topics)
     print("\nAll topics have been saved.")
+    print(subject_pipeline.stats.summary())
+    print(subject_pipeline.store.report())
 
 if __name__ == "__main__":
     scrap()
@@ -0,0 +1,274 @@
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import db_handler
+import metrics
+from db_handler import DatabaseHandler, backend_from_url
+
+CACHE_SIZE = 256
+# Seconds a cached entry is served from memory before its stored version is read again; writes from
+# other processes show up within this long.
+VERSION_CHECK_INTERVAL = 1.0
+# Versions catch every write, so this is only a backstop.
+CACHE_TTL = 300
+DEFAULT_PORT = 8750
+
+
+# ----------------------- Study Order Cache -----------------------
+class StudyOrderCache:
+    """LRU cache of each subject's stored study order, read through from the database.
+
+    An entry holds the subject's whole ranked list, so any top-K is a slice of it.
+    Hits are answered from memory; at most every `check_interval` seconds one
+    reader compares the subject's `version` in the database with the one the
+    entry was loaded at, so writes from any process (the GUI, a batch run) show
+    up within that interval. Writes made in this process drop the entry at once.
+    Entries also expire after `ttl` seconds. Concurrent misses for one subject
+    share a single query. `capacity=0` turns caching off.
+    """
+
+    def __init__(self, backend=None, capacity=CACHE_SIZE, ttl=CACHE_TTL, check_interval=VERSION_CHECK_INTERVAL):
+        self.backend = backend or backend_from_url()
+        self.capacity = capacity
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.entries = OrderedDict()
+        self.loading = {}
+        self.generations = {}
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        db_handler.add_write_listener(self.on_write)
+
+    def study_order(self, subject_name, k=None):
+        """Returns [{"rank", "topic", "importance", "pdf_path"}] of a subject's top `k` topics (all when None)."""
+        rows = self.lookup(subject_name)
+        return [{"rank": rank, "topic": topic, "importance": importance, "pdf_path": pdf_path}
+                for topic, pdf_path, rank, importance in (rows if k is None else rows[:k])]
+
+    def lookup(self, subject_name):
+        """The subject's (topic, pdf_path, rank, importance) rows in study order; empty when none are stored."""
+        with self.lock:
+            entry = self.cached(subject_name)
+        if entry is not None and self.fresh(subject_name, entry):
+            return entry[2]
+        with self.lock:
+            loader = self.loading.setdefault(subject_name, threading.Lock())
+        with loader:
+            with self.lock:
+                entry = self.cached(subject_name)  # Possibly loaded by the thread this one waited for.
+                generation = (self.epoch, self.generations.get(subject_name, 0))
+            if entry is not None and self.fresh(subject_name, entry):
+                return entry[2]
+            version, rows = self.load(subject_name)
+            with self.lock:
+                self.misses += 1
+                metrics.inc("cache_lookups", cache="study_order", result="miss")
+                # A write that landed during the query may not be in `rows`; let the next reader reload.
+                if self.capacity and (self.epoch, self.generations.get(subject_name, 0)) == generation:
+                    now = time.monotonic()
+                    self.entries[subject_name] = [now, version, rows, now]  # Loaded at, version, rows, checked at.
+                    self.entries.move_to_end(subject_name)
+                    while len(self.entries) > self.capacity:
+                        self.entries.popitem(last=False)
+                self.loading.pop(subject_name, None)
+        return rows
+
+    def cached(self, subject_name):
+        entry = self.entries.get(subject_name)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= self.ttl:
+            del self.entries[subject_name]
+            return None
+        self.entries.move_to_end(subject_name)
+        return entry
+
+    def fresh(self, subject_name, entry):
+        """Counts a hit, unless the entry is due a version check and the stored version moved on;
+        then the entry is dropped."""
+        now = time.monotonic()
+        with self.lock:
+            due = now - entry[3] >= self.check_interval
+            if due:
+                entry[3] = now  # One reader checks; the others keep answering from memory meanwhile.
+        if due:
+            with metrics.span("db_read", table="subjects"), DatabaseHandler(self.backend) as db:
+                version = db.subject_version(subject_name)
+            if version != entry[1]:
+                with self.lock:
+                    if self.entries.get(subject_name) is entry:
+                        del self.entries[subject_name]
+                return False
+        with self.lock:
+            self.hits += 1
+        metrics.inc("cache_lookups", cache="study_order", result="hit")
+        return True
+
+    def load(self, subject_name):
+        """Returns the subject's version and its rows, read in that order so a write in between forces a reload."""
+        with metrics.span("db_read", table="subject_topic"), DatabaseHandler(self.backend) as db:
+            version = db.subject_version(subject_name)
+            rows = db.top_topics(subject_name)
+            if not rows and db.migrate_subject_table(subject_name):
+                version = db.subject_version(subject_name)
+                rows = db.top_topics(subject_name)
+        return version, tuple(tuple(row) for row in rows)
+
+    def on_write(self, location, subject_name):
+        if location == self.backend.location:
+            self.invalidate(subject_name)
+
+    def invalidate(self, subject_name=None):
+        """Drops one subject's entry, or every entry when no subject is given."""
+        with self.lock:
+            if subject_name is None:
+                self.epoch += 1
+                self.entries.clear()
+            else:
+                self.entries.pop(subject_name, None)
+                self.generations[subject_name] = self.generations.get(subject_name, 0) + 1
+
+    def report(self):
+        lookups = self.hits + self.misses
+        return (f"Study orders: {len(self.entries)} cached, hit rate {self.hits / lookups if lookups else 0.0:.0%} "
+                f"({self.hits} hits, {self.misses} misses)")
+
+    def close(self):
+        db_handler.remove_write_listener(self.on_write)
+
+
+# ----------------------- HTTP API -----------------------
+class StudyOrderHandler(BaseHTTPRequestHandler):
+    """GET /study-order?subject=<name>&k=<n>, GET /health and GET /metrics (Prometheus text)."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, so readers reuse their connection.
+    # Headers and body go out as separate writes; with Nagle on, each response on a
+    # kept-alive connection waits ~40 ms for the client's delayed ACK.
+    disable_nagle_algorithm = True
+    cache = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        endpoint = url.path if url.path in ("/health", "/metrics", "/study-order") else "other"
+        with metrics.span("study_order_request", endpoint=endpoint):
+            if endpoint == "/health":
+                self.send_json({"status": "ok"})
+            elif endpoint == "/metrics":
+                self.send_body(metrics.to_prometheus(), "text/plain; version=0.0.4")
+            elif endpoint == "/study-order":
+                self.send_study_order(parse_qs(url.query))
+            else:
+                self.send_json({"error": f"no such endpoint: {url.path}"}, status=404)
+
+    def send_study_order(self, params):
+        subject_name = params.get("subject", [""])[0].strip()
+        k = params.get("k", [None])[0]
+        if not subject_name:
+            self.send_json({"error": "subject is required"}, status=400)
+            return
+        try:
+            k = None if k is None else int(k)
+            if k is not None and k < 1:
+                raise ValueError
+        except ValueError:
+            self.send_json({"error": "k must be a positive integer"}, status=400)
+            return
+        try:
+            topics = self.cache.study_order(subject_name, k)
+        except Exception as e:
+            self.send_json({"error": f"database unavailable: {e}"}, status=503)
+            return
+        if not topics:
+            self.send_json({"error": f"no study order stored for subject '{subject_name}'"}, status=404)
+            return
+        self.send_json({"subject": subject_name, "k": k, "topics": topics})
+
+    def send_json(self, body, status=200):
+        self.send_body(json.dumps(body), "application/json", status)
+
+    def send_body(self, body, content_type, status=200):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StudyOrderServer:
+    """Serves a StudyOrderCache over HTTP/JSON from a thread per connection; use as a context manager
+    to run it in the background, or call serve_forever()."""
+
+    def __init__(self, cache=None, host="127.0.0.1", port=DEFAULT_PORT):
+        self.cache = cache or StudyOrderCache()
+
+        class Handler(StudyOrderHandler):
+            pass
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 128  # Many readers connect at once.
+
+        Handler.cache = self.cache
+        self.server = Server((host, port), Handler)
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.thread is not None:
+            self.server.shutdown()
+        self.server.server_close()
+        self.cache.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve stored study orders over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default=None, help="database URL, e.g. sqlite:///edumate.db (default: EDUMATE_DB or MySQL)")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="subjects kept in the cache")
+    parser.add_argument("--ttl", type=float, default=CACHE_TTL, help="seconds before a cached study order is reloaded")
+    parser.add_argument("--check-interval", type=float, default=VERSION_CHECK_INTERVAL,
+                        help="seconds between checks of a cached subject's stored version")
+    args = parser.parse_args(argv)
+
+    cache = StudyOrderCache(backend_from_url(args.db), capacity=args.cache_size, ttl=args.ttl,
+                            check_interval=args.check_interval)
+    server = StudyOrderServer(cache, args.host, args.port)
+    print(f"Serving study orders on {server.url}/study-order?subject=<name>&k=<n>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(cache.report())
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,79 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+import metrics
+
+SENTENCE_BREAK = "\x00"
+TOKEN_PATTERN = re.compile(r"\w+|\x00")
+# Sentences with fewer content words than this only make the summary if nothing else can.
+MIN_CONTENT_WORDS = 3
+# Below this much text in total, process start-up costs more than it saves.
+PARALLEL_MIN_CHARS = 200_000
+
+
+@lru_cache(maxsize=None)
+def stop_words():
+    # scikit-learn's list, loaded on first use; importing sklearn costs over a second.
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+    return np.array(sorted(ENGLISH_STOP_WORDS))
+
+
+# ----------------------- Extractive Summarizer -----------------------
+def score_sentences(sentences):
+    """Scores sentences by the mean document frequency of their content words.
+
+    The sentences are tokenized in one pass, with a separator token marking each
+    boundary; tokens become integer ids, each sentence becomes a sparse row of id
+    counts, and the scores are one sparse matrix-vector product.
+    """
+    from scipy import sparse
+
+    tokens = np.array(TOKEN_PATTERN.findall(SENTENCE_BREAK.join(sentences).lower()))
+    if not len(tokens):
+        return np.zeros(len(sentences))
+    is_break = tokens == SENTENCE_BREAK
+    sentence_ids = np.cumsum(is_break)[~is_break]
+    vocabulary, token_ids = np.unique(tokens[~is_break], return_inverse=True)
+
+    is_content = ~np.isin(vocabulary, stop_words()) & ~np.char.isdigit(vocabulary)
+    keep = is_content[token_ids]
+    sentence_ids, token_ids = sentence_ids[keep], token_ids[keep]
+
+    frequencies = np.bincount(token_ids, minlength=len(vocabulary)).astype(float)
+    if frequencies.max(initial=0) > 0:
+        frequencies /= frequencies.max()
+    counts = sparse.csr_matrix((np.ones(len(token_ids)), (sentence_ids, token_ids)),
+                               shape=(len(sentences), len(vocabulary)))
+    lengths = np.asarray(counts.sum(axis=1)).ravel()
+    scores = (counts @ frequencies) / np.maximum(lengths, 1)
+    scores[lengths < MIN_CONTENT_WORDS] -= 1.0
+    return scores
+
+
+def summarize(text, num_sentences=5):
+    """Returns the `num_sentences` best sentences of `text` in their original order."""
+    from nltk.tokenize import sent_tokenize
+
+    with metrics.span("summarize"):
+        sentences = sent_tokenize(text)
+        if len(sentences) <= num_sentences:
+            return text
+        scores = score_sentences(sentences)
+        best = np.sort(np.argsort(-scores, kind="stable")[:num_sentences])
+    return " ".join(sentences[i] for i in best)
+
+
+def summarize_many(texts, num_sentences=5, max_workers=None):
+    """Summarizes many texts across a process pool, keeping their order."""
+    texts = list(texts)
+    max_workers = max_workers or min(len(texts), os.cpu_count() or 1)
+    if max_workers <= 1 or len(texts) <= 1 or sum(map(len, texts)) < PARALLEL_MIN_CHARS:
+        return [summarize(text, num_sentences) for text in texts]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        chunksize = max(1, len(texts) // (4 * max_workers))
+        return list(executor.map(summarize, texts, [num_sentences] * len(texts), chunksize=chunksize))
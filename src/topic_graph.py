@@ -0,0 +1,66 @@
+import numpy as np
+from scipy import sparse
+
+
+# ----------------------- Sparse Topic Graph -----------------------
+class TopicGraph:
+    """Topic dependency graph stored as a CSR adjacency matrix with a topic-id index."""
+
+    def __init__(self, topics, matrix):
+        self.topics = list(topics)
+        self.index = {topic: i for i, topic in enumerate(self.topics)}
+        self.matrix = sparse.csr_matrix(matrix, dtype=float)
+        self.iterations = 0
+
+    @classmethod
+    def from_adjacency_list(cls, adjacency_list):
+        """Builds the graph from a {topic: [related topics]} dict in one sparse construction."""
+        index = {}
+        rows, cols = [], []
+        for topic, related_topics in adjacency_list.items():
+            if not related_topics:
+                continue
+            row = index.setdefault(topic, len(index))
+            for related_topic in related_topics:
+                rows.append(row)
+                cols.append(index.setdefault(related_topic, len(index)))
+        n = len(index)
+        matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+        matrix.data[:] = 1.0  # Repeated edges collapse to one, as in a DiGraph.
+        return cls(index, matrix)
+
+    def __len__(self):
+        return len(self.topics)
+
+    def pagerank(self, alpha=0.85, tol=1.0e-6, max_iter=100, start=None):
+        """Vectorized power iteration, equivalent to nx.pagerank on the same graph.
+
+        `start` is an optional {topic: score} dict from a previous ranking. Known
+        topics keep their old score, new ones get the uniform share, so re-ranking
+        after a small change converges in a few iterations.
+        """
+        n = len(self.topics)
+        if n == 0:
+            self.iterations = 0
+            return {}
+
+        out_degree = np.asarray(self.matrix.sum(axis=1)).ravel()
+        inv_degree = np.zeros(n)
+        inv_degree[out_degree != 0] = 1.0 / out_degree[out_degree != 0]
+        transition = sparse.diags(inv_degree) @ self.matrix
+        is_dangling = np.where(out_degree == 0)[0]
+        uniform = np.repeat(1.0 / n, n)
+
+        if start:
+            x = np.array([start.get(topic, 1.0 / n) for topic in self.topics], dtype=float)
+            x /= x.sum()
+        else:
+            x = uniform.copy()
+
+        for iteration in range(1, max_iter + 1):
+            x_last = x
+            x = alpha * (x @ transition + x[is_dangling].sum() * uniform) + (1 - alpha) * uniform
+            if np.abs(x - x_last).sum() < n * tol:
+                self.iterations = iteration
+                return dict(zip(self.topics, map(float, x)))
+        raise RuntimeError(f"PageRank failed to converge in {max_iter} iterations.")
@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import metrics
+from http_pool import PooledFetcher
+
+YOUTUBE_API_URL = "https://www.googleapis.com"
+VIDEO_CACHE_PATH = "youtube_cache.json"
+DEFAULT_TTL = 7 * 24 * 3600
+# search.list costs 100 units of the default 10,000-unit daily quota.
+SEARCH_COST = 100
+DAILY_QUOTA = 10_000
+# The cache file is rewritten at most this often while searches come in; close() writes the rest.
+SAVE_INTERVAL = 5.0
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def error_reasons(response):
+    """The `reason` of each error in a Google API error response."""
+    try:
+        return [error.get("reason") for error in response.json()["error"].get("errors", [])]
+    except (ValueError, KeyError, AttributeError):
+        return []
+
+
+def quota_refused(response):
+    return response.status_code == 403 and bool({"quotaExceeded", "dailyLimitExceeded"} & set(error_reasons(response)))
+
+
+def billed_attempts(attempts):
+    """How many of a request's attempts the API charged for.
+
+    Every request that reached the server counts, errors and retries included, except
+    the ones refused for quota; connection failures and connect timeouts never got there.
+    """
+    return sum(not quota_refused(attempt) if isinstance(attempt, requests.Response)
+               else isinstance(attempt, requests.ReadTimeout) for attempt in attempts)
+
+
+def quota_day(now=None):
+    # The quota resets at midnight Pacific time; UTC-8 is close enough to bucket spending by day.
+    return time.strftime("%Y-%m-%d", time.gmtime((now or time.time()) - 8 * 3600))
+
+
+class VideoLookupStats:
+    """Cache hits, searches and quota units for one run (or the lifetime of a VideoLookup)."""
+
+    def __init__(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.searches = 0
+        self.units = 0
+        self.quota_denied = 0
+        self.lock = threading.Lock()
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / lookups if lookups else 0.0
+
+    def summary(self):
+        return (f"video lookups: {self.hits + self.stale_hits + self.misses}, hit rate: {self.hit_rate:.0%} "
+                f"({self.stale_hits} stale), searches: {self.searches}, quota units: {self.units}, "
+                f"denied for quota: {self.quota_denied}")
+
+
+# ----------------------- YouTube Search -----------------------
+class VideoLookup:
+    """Top YouTube videos per topic over a pooled session, cached per normalized query.
+
+    Results are cached for `ttl` seconds in a JSON file together with the quota
+    units spent today, rewritten at most every `save_interval` seconds and on close().
+    Each search reserves SEARCH_COST up front and settles it once the attempts
+    it actually sent are known. Once `daily_quota` is used up, or the API answers
+    quotaExceeded, no more searches are sent until the next quota day; lookups
+    then return the cached list, however old, or an empty one.
+    """
+
+    def __init__(self, api_key=None, base_url=YOUTUBE_API_URL, cache_path=VIDEO_CACHE_PATH, ttl=DEFAULT_TTL,
+                 daily_quota=DAILY_QUOTA, max_results=5, rate=5.0, fetcher=None, save_interval=SAVE_INTERVAL):
+        self.api_key = api_key if api_key is not None else os.getenv('YOUTUBE_API')
+        self.base_url = base_url
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.daily_quota = daily_quota
+        self.max_results = max_results
+        self.save_interval = save_interval
+        self.dirty = False
+        self.saved_at = time.monotonic()
+        self.own_fetcher = fetcher is None
+        self.fetcher = fetcher or PooledFetcher(rate=rate)
+        self.lock = threading.RLock()
+        self.stats = VideoLookupStats()
+        self.warned_no_key = False
+        self.entries = {}
+        self.quota = {"day": quota_day(), "spent": 0, "exhausted": False}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.entries = data.get("entries", {})
+                self.quota.update(data.get("quota", {}))
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Ignoring unreadable video cache {cache_path}: {e}")
+
+    def quota_left(self):
+        with self.lock:
+            if self.quota["day"] != quota_day():
+                self.quota = {"day": quota_day(), "spent": 0, "exhausted": False}
+            if self.quota["exhausted"]:
+                return 0
+            return max(0, self.daily_quota - self.quota["spent"])
+
+    def reserve_search(self):
+        """Claims SEARCH_COST units before a search is sent; False when the quota cannot cover it."""
+        with self.lock:
+            if self.quota_left() < SEARCH_COST:
+                return False
+            self.quota["spent"] += SEARCH_COST
+            return True
+
+    def settle_search(self, billed):
+        """Swaps the SEARCH_COST reserved for a search for what its `billed` attempts cost."""
+        with self.lock:
+            self.quota_left()  # A reservation made before a quota-day rollover is gone already.
+            self.quota["spent"] = max(0, self.quota["spent"] + (billed - 1) * SEARCH_COST)
+            self.dirty = True
+
+    def search(self, topic, stats=None):
+        """Returns [(title, link)] of the top videos for a topic."""
+        key = normalize_query(topic)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and time.time() - entry["stored_at"] < self.ttl:
+            self.record(stats, hits=1)
+            return [tuple(video) for video in entry["videos"]]
+
+        videos = None
+        if not self.api_key:
+            with self.lock:
+                if not self.warned_no_key:
+                    print("No YouTube API key (set YOUTUBE_API); videos come from the cache only.")
+                self.warned_no_key = True
+        elif not self.reserve_search():
+            self.record(stats, quota_denied=1)
+        else:
+            with metrics.span("youtube_search"):
+                videos, billed = self.request(topic)
+            self.settle_search(billed)
+            if billed:
+                self.record(stats, searches=billed, units=billed * SEARCH_COST)
+            elif self.quota_left() < SEARCH_COST:
+                self.record(stats, quota_denied=1)
+            if videos is not None:
+                with self.lock:
+                    self.entries[key] = {"videos": videos, "stored_at": time.time()}
+                    self.dirty = True
+            self.save_if_due()
+
+        if videos is None and entry:
+            self.record(stats, stale_hits=1)
+            return [tuple(video) for video in entry["videos"]]
+        self.record(stats, misses=1)
+        return [tuple(video) for video in videos or []]
+
+    def record(self, stats, **counts):
+        """Adds counts to the lifetime stats, the caller's run stats and the process metrics."""
+        for counter in [self.stats] + ([stats] if stats is not None else []):
+            counter.add(**counts)
+        for name, value in counts.items():
+            metrics.inc(f"youtube_{name}", value)
+
+    def request(self, topic):
+        """Sends one search.list request, retries included.
+
+        Returns (videos or None if the search failed, how many attempts were billed).
+        """
+        params = {"part": "snippet", "q": topic, "maxResults": self.max_results, "type": "video", "key": self.api_key}
+        attempts = []
+        try:
+            response = self.fetcher.get(f"{self.base_url}/youtube/v3/search", attempts=attempts, params=params)
+        except Exception as e:
+            # The exception's message carries the request URL, API key included; log only its type.
+            print(f"Failed to fetch YouTube videos for {topic}: {type(e).__name__}")
+            return None, billed_attempts(attempts)
+        if response.status_code == 200:
+            return [(item["snippet"]["title"], f"https://www.youtube.com/watch?v={item['id']['videoId']}")
+                    for item in response.json().get("items", []) if "videoId" in item.get("id", {})], \
+                billed_attempts(attempts)
+        if quota_refused(response):
+            with self.lock:
+                if not self.quota["exhausted"]:
+                    print("YouTube quota exhausted; using cached videos until it resets.")
+                    self.quota["exhausted"] = True
+                    self.dirty = True
+                    self.save()  # Written straight away so other runs stop searching too.
+            return None, billed_attempts(attempts)
+        print(f"Failed to fetch YouTube videos: {response.status_code}")
+        return None, billed_attempts(attempts)
+
+    def search_many(self, topics, max_workers=4, stats=None):
+        """Searches topics concurrently; returns {topic: [(title, link)]}, one request per normalized query."""
+        unique = list({normalize_query(topic): topic for topic in topics}.values())
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            found = dict(zip(map(normalize_query, unique), executor.map(lambda topic: self.search(topic, stats), unique)))
+        self.save()
+        return {topic: found[normalize_query(topic)] for topic in topics}
+
+    def save_if_due(self):
+        if self.dirty and time.monotonic() - self.saved_at >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """Writes the cache file if anything changed since it was last written."""
+        if not self.cache_path:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp_path = f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"quota": self.quota, "entries": self.entries}, f)
+            os.replace(tmp_path, self.cache_path)
+            self.dirty = False
+            self.saved_at = time.monotonic()
+
+    def report(self):
+        return f"YouTube: {self.stats.summary()}, quota left today: {self.quota_left()}"
+
+    def close(self):
+        self.save()
+        if self.own_fetcher:
+            self.fetcher.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()